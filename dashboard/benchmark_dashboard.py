@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Dashboard Benchmark
+Generates synthetic scanner vaults and times NetworkDashboard syncs, payload
+queries and /api/dashboard at each vault size. Results are written as JSON,
+so runs from different releases can be compared with --compare.
+
+Usage: python3 benchmark_dashboard.py [--sizes 1000,10000,100000] [--changed 0.01]
+                                      [--repeat 3] [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmark_parser import generate_device_markdown
+
+SCAN_TYPES = ('discovery', 'fingerprint', 'vuln')
+# Lower is better for every metric except these
+HIGHER_IS_BETTER = ('full_sync_rows_per_second',)
+# Describe the run rather than the dashboard, so --compare skips them
+NOT_COMPARED = ('devices', 'vault_generate_seconds', 'incremental_sync_files')
+
+
+def device_ip(index):
+    """Spread devices over /24 networks with 250 hosts each"""
+    network, host = divmod(index, 250)
+    return f'10.{network // 256 % 256}.{network % 256}.{host + 1}'
+
+
+def generate_scan_summary(scan_type, ips, new_ips):
+    """Build a scan summary in the layout the scanner writes"""
+    lines = [f'# {scan_type.title()} Scan', '', '## Devices', '']
+    lines += [f'- [[{ip}]]' for ip in ips]
+    lines += ['', '## New Devices', '']
+    lines += [f'- {ip}' for ip in new_ips]
+    return '\n'.join(lines) + '\n\n'
+
+
+def generate_vault(path, devices, scan_days, seed):
+    """Write device files plus scan summaries for the last scan_days days"""
+    rng = random.Random(seed)
+    ips = [device_ip(index) for index in range(devices)]
+    for ip in ips:
+        with open(os.path.join(path, f'{ip}.md'), 'w', encoding='utf-8') as f:
+            f.write(generate_device_markdown(ip, rng))
+
+    today = date.today()
+    for day in range(scan_days):
+        scan_date = (today - timedelta(days=day)).isoformat()
+        # Discovery sees most devices, fingerprint and vuln scans a sample
+        found = {
+            'discovery': [ip for ip in ips if rng.random() < 0.9],
+            'fingerprint': rng.sample(ips, max(1, devices // 10)),
+            'vuln': rng.sample(ips, max(1, devices // 20)),
+        }
+        for scan_type in SCAN_TYPES:
+            new_ips = rng.sample(found[scan_type], min(len(found[scan_type]), rng.randint(0, 5)))
+            with open(os.path.join(path, f'{scan_type}_{scan_date}.md'), 'w', encoding='utf-8') as f:
+                f.write(generate_scan_summary(scan_type, found[scan_type], new_ips))
+    return ips
+
+
+def best_of(function, repeat):
+    """Fastest of repeat calls, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def timed(function):
+    """(result, seconds) of one call"""
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def run_size(devices, workdir, args):
+    """Benchmark one vault size; runs in its own process, see main()"""
+    vault = os.path.join(workdir, 'scanner_data')
+    os.makedirs(vault)
+    os.makedirs(os.path.join(workdir, 'data'))
+    _, generate_seconds = timed(lambda: generate_vault(vault, devices, args.scan_days, args.seed))
+    ips = [device_ip(index) for index in range(devices)]
+
+    # The app reads its paths at import time
+    import dashboard_app
+    dashboard = dashboard_app.dashboard
+    # Background sync is off here, so no thread runs yet
+    dashboard.start_parse_pool()
+    client = dashboard_app.app.test_client()
+
+    result = {'devices': devices, 'vault_generate_seconds': round(generate_seconds, 3)}
+
+    def sync():
+        if not dashboard.sync_from_scanner_data():
+            raise RuntimeError('Sync failed')
+
+    _, seconds = timed(sync)
+    result['full_sync_seconds'] = seconds
+    result['full_sync_rows_per_second'] = devices / seconds
+    _, result['noop_sync_seconds'] = timed(sync)
+
+    # Rewrite a fraction of the device files, as a scan that updated them would
+    rng = random.Random(args.seed + 1)
+    changed = rng.sample(ips, max(1, int(devices * args.changed)))
+    for ip in changed:
+        with open(os.path.join(vault, f'{ip}.md'), 'w', encoding='utf-8') as f:
+            f.write(generate_device_markdown(ip, rng))
+    result['incremental_sync_files'] = len(changed)
+    _, result['incremental_sync_seconds'] = timed(sync)
+
+    result['get_dashboard_data_seconds'] = best_of(dashboard.get_dashboard_data, args.repeat)
+
+    def cold_request():
+        dashboard.invalidate_dashboard_snapshot()
+        response = client.get('/api/dashboard')
+        assert response.status_code == 200
+    result['api_dashboard_cold_seconds'] = best_of(cold_request, args.repeat)
+
+    response = client.get('/api/dashboard')
+    result['api_dashboard_bytes'] = len(response.data)
+    # Transfer sizes of the negotiated formats and encodings the server supports
+    variants = [('gzip', {'Accept-Encoding': 'gzip'}), ('br', {'Accept-Encoding': 'br'}),
+                ('msgpack', {'Accept': dashboard_app.MSGPACK_MIMETYPE}),
+                ('msgpack_br', {'Accept': dashboard_app.MSGPACK_MIMETYPE, 'Accept-Encoding': 'br'})]
+    for name, headers in variants:
+        variant = client.get('/api/dashboard', headers=headers)
+        encoding = headers.get('Accept-Encoding')
+        if variant.headers.get('Content-Encoding') == encoding and (
+                'Accept' not in headers or variant.mimetype == headers['Accept']):
+            result[f'api_dashboard_{name}_bytes'] = len(variant.data)
+    result['api_dashboard_warm_seconds'] = best_of(lambda: client.get('/api/dashboard'), args.repeat)
+    etag = response.headers['ETag']
+    result['api_dashboard_revalidate_seconds'] = best_of(
+        lambda: client.get('/api/dashboard', headers={'If-None-Match': etag}), args.repeat)
+
+    result['database_bytes'] = sum(
+        os.path.getsize(dashboard_app.DATABASE_PATH + suffix)
+        for suffix in ('', '-wal') if os.path.exists(dashboard_app.DATABASE_PATH + suffix))
+    # ru_maxrss is in KiB on Linux
+    result['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return result
+
+
+def environment():
+    """Where the results come from, for telling runs apart"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, check=True,
+                                capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Print each metric against a previous run, returns the number of regressions"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {entry['devices']: entry for entry in json.load(f)['results']}
+
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (regression: more than {threshold:g}x worse)")
+    for entry in results:
+        old = baseline.get(entry['devices'])
+        if not old:
+            continue
+        for metric, value in entry.items():
+            if metric in NOT_COMPARED or not isinstance(old.get(metric), (int, float)) or not old[metric] or not value:
+                continue
+            ratio = old[metric] / value if metric in HIGHER_IS_BETTER else value / old[metric]
+            flag = 'REGRESSION' if ratio > threshold else ''
+            regressions += bool(flag)
+            print(f"  {entry['devices']:>7} {metric:<34} {old[metric]:>14.4f} -> {value:>14.4f} {ratio:6.2f}x {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dashboard syncs and API payloads')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated device counts')
+    parser.add_argument('--changed', type=float, default=0.01,
+                        help='fraction of device files rewritten for the incremental sync')
+    parser.add_argument('--scan-days', type=int, default=7, help='days of scan summaries per scan type')
+    parser.add_argument('--repeat', type=int, default=3, help='timing repetitions for reads (best is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the synthetic vault')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON results file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio reported as a regression by --compare')
+    parser.add_argument('--workdir', help='directory for the vaults and databases (default: a temporary one)')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size:
+        # Child process: report one size as JSON on the last line of stdout
+        result = run_size(args.run_size, args.workdir, args)
+        print(json.dumps(result))
+        return
+
+    # Every size runs in a fresh process, so that caches, pools and peak
+    # memory of one size do not carry over to the next
+    root = args.workdir or tempfile.mkdtemp(prefix='nmapping-benchmark-')
+    results = []
+    try:
+        for devices in (int(size) for size in args.sizes.split(',')):
+            workdir = os.path.join(root, str(devices))
+            shutil.rmtree(workdir, ignore_errors=True)
+            env = dict(os.environ, NMAPPING_DASHBOARD_DIR=workdir, NMAPPING_BACKGROUND_SYNC='0')
+            print(f"Benchmarking {devices} devices...", flush=True)
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--run-size', str(devices), '--workdir', workdir,
+                 '--changed', str(args.changed), '--scan-days', str(args.scan_days),
+                 '--repeat', str(args.repeat), '--seed', str(args.seed)],
+                cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True)
+            if child.returncode != 0:
+                sys.exit(f"Benchmark of {devices} devices failed:\n{child.stderr or child.stdout}")
+            results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        'benchmark': 'dashboard',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'environment': environment(),
+        'parameters': {'changed': args.changed, 'scan_days': args.scan_days,
+                       'repeat': args.repeat, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    for entry in results:
+        print(f"\n{entry['devices']} devices")
+        for metric, value in entry.items():
+            if metric != 'devices':
+                print(f"  {metric:<34} {value:>14.4f}" if isinstance(value, float) else f"  {metric:<34} {value:>14}")
+    print(f"\nResults written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
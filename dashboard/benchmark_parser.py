@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Parser Benchmark
+Times DeviceMarkdownParser against the original per-field regex extraction
+on synthetic device files and checks that both produce identical output.
+
+Usage: python3 benchmark_parser.py [--files 2000] [--repeat 5] [--seed 42]
+"""
+
+import argparse
+import random
+import re
+import time
+
+import frontmatter
+from device_parser import DeviceMarkdownParser
+
+VENDORS = ['Cisco Systems', 'Dell Inc.', 'Raspberry Pi Trading', 'Ubiquiti Networks', 'Unknown']
+SERVICES = [
+    ('22/tcp', 'open', 'ssh', 'OpenSSH 7.4'),
+    ('53/udp', 'open', 'domain', 'dnsmasq 2.80'),
+    ('80/tcp', 'open', 'http', 'nginx 1.18.0'),
+    ('443/tcp', 'open', 'https', 'nginx 1.18.0'),
+    ('445/tcp', 'filtered', 'microsoft-ds', ''),
+    ('3306/tcp', 'closed', 'mysql', ''),
+    ('8080/tcp', 'open', 'http-proxy', 'Jetty 9.4'),
+]
+
+
+def generate_device_markdown(ip, rng):
+    """Build a device file in the layout the scanner writes"""
+    mac = ':'.join(f'{rng.randrange(256):02x}' for _ in range(6))
+    services = rng.sample(SERVICES, rng.randint(1, len(SERVICES)))
+    lines = [
+        '---',
+        f'ip: {ip}',
+        'tags: [device]',
+        '---',
+        f'# {ip}',
+        '',
+        f'**MAC:** {mac}',
+        f'**Vendor:** {rng.choice(VENDORS)}',
+        f'**Hostname:** host-{ip.replace(".", "-")}',
+        f'**First Seen:** 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        f'**Last Seen:** 2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        '',
+        '## OS & Services',
+        '',
+        f'OS: Linux {rng.randint(3, 6)}.{rng.randint(0, 19)}',
+        '',
+        '```',
+        'PORT      STATE    SERVICE   VERSION',
+    ]
+    lines += [f'{port:<9} {state:<8} {name:<9} {version}'.rstrip() for port, state, name, version in services]
+    lines += ['```', '', '## Vulnerabilities', '']
+    lines += [f'- CVE-20{rng.randint(10, 25)}-{rng.randint(1000, 49999)} ({rng.choice(["low", "medium", "high"])})'
+              for _ in range(rng.randint(0, 4))]
+    lines += ['', '## Notes', '', 'Discovered by scheduled discovery scan.', '']
+    return '\n'.join(lines)
+
+
+def legacy_parse(text):
+    """Original NetworkDashboard parsing of a device file"""
+    try:
+        content = frontmatter.loads(text).content
+    except Exception:
+        content = text
+    return legacy_parse_content(content)
+
+
+def legacy_parse_content(content):
+    """Original NetworkDashboard extraction: one regex pass per field and section"""
+    def extract_field(content, pattern):
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match:
+            value = re.sub(r'^\*\*|\*\*$', '', match.group(1).strip())
+            return value if value and value != 'Unknown' else ""
+        return ""
+
+    def extract_section(content, section_pattern):
+        match = re.search(f"{section_pattern}.*?(?=## |$)", content, re.DOTALL | re.IGNORECASE)
+        return match.group(0).strip() if match else ""
+
+    def extract_services(content):
+        services = []
+        for line in content.split('\n'):
+            if re.search(r'\d+/(tcp|udp)\s+(open|filtered|closed)', line, re.IGNORECASE):
+                services.append(line.strip())
+            elif re.search(r'Port\s+\d+', line, re.IGNORECASE):
+                services.append(line.strip())
+        return '\n'.join(services)
+
+    return {
+        'mac': extract_field(content, r'\*\*MAC:\*\*\s*(.+)'),
+        'vendor': extract_field(content, r'\*\*Vendor:\*\*\s*(.+)'),
+        'hostname': extract_field(content, r'\*\*Hostname:\*\*\s*(.+)'),
+        'first_seen': extract_field(content, r'\*\*First Seen:\*\*\s*(.+)'),
+        'last_seen': extract_field(content, r'\*\*Last Seen:\*\*\s*(.+)'),
+        'os_info': extract_section(content, r'## OS & Services'),
+        'vulnerabilities': extract_section(content, r'## Vulnerabilities'),
+        'services': extract_services(content),
+    }
+
+
+def time_per_file(parse, documents, repeat):
+    """Best-of-N mean parse time per document, in microseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for document in documents:
+            parse(document)
+        best = min(best, time.perf_counter() - start)
+    return best / len(documents) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark device markdown parsing')
+    parser.add_argument('--files', type=int, default=2000, help='number of synthetic device files')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions (best is reported)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the synthetic files')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = [generate_device_markdown(f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}', rng)
+                 for i in range(args.files)]
+    device_parser = DeviceMarkdownParser()
+
+    mismatches = sum(1 for document in documents if device_parser.parse(document) != legacy_parse(document))
+    # Frontmatter handling is shared, so time the markdown extraction on its own too
+    bodies = [frontmatter.loads(document).content for document in documents]
+
+    results = [
+        ('legacy regex (file)', time_per_file(legacy_parse, documents, args.repeat)),
+        ('DeviceMarkdownParser (file)', time_per_file(device_parser.parse, documents, args.repeat)),
+        ('legacy regex (body only)', time_per_file(legacy_parse_content, bodies, args.repeat)),
+        ('DeviceMarkdownParser (body only)', time_per_file(device_parser.parse_content, bodies, args.repeat)),
+    ]
+
+    print(f"Parsed {args.files} synthetic device files, {mismatches} output mismatches")
+    for name, micros in results:
+        print(f"  {name:<34} {micros:8.1f} us/file")
+
+
+if __name__ == '__main__':
+    main()
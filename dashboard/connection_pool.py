@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Connection Pool
+Bounded pools of reusable SQLite connections for the dashboard.
+"""
+
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """No pooled connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """Hand out SQLite connections, reusing idle ones and capping how many are open"""
+
+    def __init__(self, db_path, size, readonly=False, timeout=10.0, busy_timeout_ms=5000, pragmas=()):
+        self.db_path = db_path
+        self.size = size
+        self.readonly = readonly
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.pragmas = tuple(pragmas)
+        self.idle = []
+        self.waiters = deque()
+        self.open = 0
+        self.lock = threading.Lock()
+        self.counters = {'acquired': 0, 'reused': 0, 'waited': 0, 'timeouts': 0, 'discarded': 0}
+
+    def connect(self):
+        """Open a new connection with the pool's mode and pragmas"""
+        if self.readonly:
+            # Read-only at the SQLite level, so API handlers can never take the write lock
+            conn = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True, check_same_thread=False,
+                                   timeout=self.busy_timeout_ms / 1000)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        for pragma in self.pragmas:
+            conn.execute(f'PRAGMA {pragma}')
+        return conn
+
+    def acquire(self):
+        """Check out an idle connection, opening one if the pool is not full yet"""
+        with self.lock:
+            self.counters['acquired'] += 1
+            if self.idle:
+                self.counters['reused'] += 1
+                return self.idle.pop()
+            if self.open < self.size:
+                self.open += 1
+                waiter = None
+            else:
+                # Queue up: released connections are handed to the oldest waiter
+                # so that a steady stream of new requests cannot starve it
+                self.counters['waited'] += 1
+                waiter = {'event': threading.Event(), 'conn': None}
+                self.waiters.append(waiter)
+
+        if waiter is not None:
+            if not waiter['event'].wait(self.timeout):
+                with self.lock:
+                    if not waiter['event'].is_set():
+                        self.waiters.remove(waiter)
+                        self.counters['timeouts'] += 1
+                        raise PoolTimeout(f'No SQLite connection free after {self.timeout:g}s')
+            if waiter['conn'] is not None:
+                return waiter['conn']
+            # A discarded connection freed a slot for us to fill
+
+        # Connect outside the lock, other threads may keep reusing idle connections
+        try:
+            return self.connect()
+        except Exception:
+            self.discard()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            self.discard()
+            return
+        with self.lock:
+            if self.waiters:
+                self.hand_over(conn)
+            else:
+                self.idle.append(conn)
+
+    def discard(self):
+        """Forget a connection that was closed instead of returned"""
+        with self.lock:
+            self.counters['discarded'] += 1
+            if self.waiters:
+                # The oldest waiter opens a replacement in the freed slot
+                self.hand_over(None)
+            else:
+                self.open -= 1
+
+    def hand_over(self, conn):
+        """Wake the oldest waiter with a connection, or None to let it open one; caller holds the lock"""
+        waiter = self.waiters.popleft()
+        if conn is not None:
+            self.counters['reused'] += 1
+        waiter['conn'] = conn
+        waiter['event'].set()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection, e.g. before the database file is replaced"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+            self.open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        """Snapshot of pool occupancy and lifetime counters"""
+        with self.lock:
+            return {
+                'size': self.size,
+                'open': self.open,
+                'idle': len(self.idle),
+                'in_use': self.open - len(self.idle),
+                'waiting': len(self.waiters),
+                **self.counters,
+            }
@@ -5,47 +5,479 @@ A modern web dashboard for network monitoring and device management.
 Self-hosted network mapping with real-time updates and interactive visualization.
 """
 
-from flask import Flask, render_template_string, jsonify, request
-from flask_socketio import SocketIO, emit
-import sqlite3
-import os
+import base64
+import csv
+import functools
+import hashlib
+import html
+import io
+import ipaddress
+import itertools
 import json
+import math
+import multiprocessing
+import os
 import re
-import markdown
-import frontmatter
-from datetime import datetime, timedelta
+import sqlite3
 import subprocess
 import threading
 import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+
+import markdown
+from connection_pool import ConnectionPool
+from device_parser import (DeviceMarkdownParser, parse_device_file,
+                           timed_parse_device_file)
+from file_watcher import FileWatcher
+from flask import Flask, g, jsonify, render_template_string, request
+from flask_socketio import SocketIO, emit
+from instrumentation import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from instrumentation import MetricsRegistry
+from leader_election import LeaderElection
+from nmap_parser import NmapXMLParser
+from sync_scheduler import SyncScheduler, new_job_record
+from worker_state import WorkerState
+
+# Optional: brotli adds Content-Encoding br next to gzip, msgpack the binary
+# dashboard payload
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'nmapping-plus-dashboard-secret-key-change-me'
-socketio = SocketIO(app, cors_allowed_origins="*")
 
 # Configuration
-DASHBOARD_DIR = '/dashboard'
+DASHBOARD_DIR = os.environ.get('NMAPPING_DASHBOARD_DIR', '/dashboard')
 DATABASE_PATH = os.path.join(DASHBOARD_DIR, 'data', 'dashboard.db')
 SCANNER_DATA_PATH = os.path.join(DASHBOARD_DIR, 'scanner_data')
+PORT = int(os.environ.get('NMAPPING_PORT', '5000'))
+
+# Multi-worker deployments: a Socket.IO message queue such as
+# redis://localhost:6379/0 carries broadcasts between worker processes, and
+# the worker holding the leader lock is the only one running syncs
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('NMAPPING_SOCKETIO_MESSAGE_QUEUE') or None
+WORKER_STATE_PATH = os.path.join(DASHBOARD_DIR, 'data', 'workers.db')
+LEADER_LOCK_PATH = os.environ.get('NMAPPING_LEADER_LOCK', os.path.join(DASHBOARD_DIR, 'data', 'sync.lock'))
+LEADER_RETRY_INTERVAL = float(os.environ.get('NMAPPING_LEADER_RETRY_INTERVAL', '10'))
+# How often the leader picks up syncs requested on other workers
+SYNC_REQUEST_POLL_INTERVAL = float(os.environ.get('NMAPPING_SYNC_REQUEST_POLL_INTERVAL', '0.5'))
+
+socketio = SocketIO(app, cors_allowed_origins="*", message_queue=SOCKETIO_MESSAGE_QUEUE)
+
+# Scanner vault file naming: dotted IPv4 or colon-separated IPv6 addresses
+DEVICE_FILE_PATTERN = re.compile(r'^(?:\d+\.\d+\.\d+\.\d+|[0-9A-Fa-f]*:[0-9A-Fa-f:.]*)\.md$')
+SCAN_FILE_PATTERN = re.compile(r'^(discovery|fingerprint|vuln)_\d{4}-\d{2}-\d{2}\.md$')
+
+# Ingest tuning
+SYNC_BATCH_SIZE = int(os.environ.get('NMAPPING_SYNC_BATCH_SIZE', '500'))
+SQLITE_SYNCHRONOUS = os.environ.get('NMAPPING_SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('NMAPPING_SQLITE_CACHE_SIZE_KB', '20000'))
+SYNC_PARSE_WORKERS = int(os.environ.get('NMAPPING_SYNC_PARSE_WORKERS', str(os.cpu_count() or 1)))
+# Below this many changed files the pool start-up cost outweighs parallel parsing
+SYNC_PARALLEL_THRESHOLD = int(os.environ.get('NMAPPING_SYNC_PARALLEL_THRESHOLD', '200'))
+
+# Run the sync scheduler (and watch mode) in this process once it is elected
+# leader; turn off for benchmarks and other tools that import the app and
+# drive syncs themselves
+BACKGROUND_SYNC = os.environ.get('NMAPPING_BACKGROUND_SYNC', '1').lower() in ('1', 'true', 'yes')
+
+# Sync schedule: seconds between syncs, +/- jitter fraction, and the cap on
+# the interval doubling after consecutive failures
+SYNC_INTERVAL = int(os.environ.get('NMAPPING_SYNC_INTERVAL', '300'))
+SYNC_JITTER = float(os.environ.get('NMAPPING_SYNC_JITTER', '0.1'))
+SYNC_MAX_BACKOFF = int(os.environ.get('NMAPPING_SYNC_MAX_BACKOFF', '3600'))
+SYNC_JOB_HISTORY = 50
+
+# Optional watch mode: ingest files as soon as they are written to the vault.
+# Events are batched until WATCH_DEBOUNCE seconds pass without new ones, or
+# at most WATCH_MAX_DELAY seconds after the first
+WATCH_ENABLED = os.environ.get('NMAPPING_WATCH', '0').lower() in ('1', 'true', 'yes')
+WATCH_BACKEND = os.environ.get('NMAPPING_WATCH_BACKEND', 'auto')
+WATCH_DEBOUNCE = float(os.environ.get('NMAPPING_WATCH_DEBOUNCE', '2'))
+WATCH_MAX_DELAY = float(os.environ.get('NMAPPING_WATCH_MAX_DELAY', '30'))
+WATCH_POLL_INTERVAL = float(os.environ.get('NMAPPING_WATCH_POLL_INTERVAL', '5'))
+
+# SQLite connection pools
+SQLITE_READ_POOL_SIZE = int(os.environ.get('NMAPPING_SQLITE_READ_POOL_SIZE', '8'))
+# SQLite allows one writer at a time, extra writers would only queue on the lock
+SQLITE_WRITE_POOL_SIZE = int(os.environ.get('NMAPPING_SQLITE_WRITE_POOL_SIZE', '2'))
+SQLITE_POOL_TIMEOUT = float(os.environ.get('NMAPPING_SQLITE_POOL_TIMEOUT', '10'))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('NMAPPING_SQLITE_BUSY_TIMEOUT_MS', '5000'))
 
 # Project Information
 PROJECT_NAME = "nMapping+"
 PROJECT_VERSION = "1.0.0"
 PROJECT_DESCRIPTION = "Self-hosted network mapping with real-time web dashboard"
 
+# Device list API
+# The binary ip_key column is internal, so API payloads select these explicitly;
+# status is not stored but computed from last_seen_at by each query
+DEVICE_COLUMNS = ('id', 'ip', 'mac', 'vendor', 'hostname', 'first_seen', 'last_seen', 'first_seen_at',
+                  'last_seen_at', 'status', 'os_info', 'services', 'vulnerabilities', 'notes',
+                  'created_at', 'updated_at')
+# List views leave out the large os_info/services/vulnerabilities/notes blobs
+DEVICE_LIST_FIELDS = ('id', 'ip', 'mac', 'vendor', 'hostname', 'first_seen', 'last_seen', 'last_seen_at',
+                      'status', 'updated_at')
+DEVICE_PAGE_SIZE = 100
+DEVICE_PAGE_SIZE_MAX = 1000
+
+# Device history API
+# last_seen moves on every scan, so it is left out of the change history.
+# Status is not stored either, but its changes are recorded as field
+# 'status': when a new last_seen moves a device to another status, and when
+# a sync finds that time has moved a device past a status window
+HISTORY_FIELDS = ('mac', 'vendor', 'hostname', 'first_seen', 'os_info', 'services', 'vulnerabilities')
+CHANGE_PAGE_SIZE = 100
+CHANGE_PAGE_SIZE_MAX = 1000
+
+# Streaming export API: rows fetched from SQLite per chunk
+EXPORT_FETCH_SIZE = 500
+EXPORT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+# Dashboard payload formats: json lists one object per device; columnar and
+# msgpack hold one array per device field, as JSON or MessagePack
+DASHBOARD_FORMATS = ('json', 'columnar', 'msgpack')
+MSGPACK_MIMETYPE = 'application/x-msgpack'
+# Response compression, negotiated with Accept-Encoding; smaller bodies are
+# not worth the extra headers
+COMPRESS_MIN_BYTES = int(os.environ.get('NMAPPING_COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = int(os.environ.get('NMAPPING_BROTLI_QUALITY', '5'))
+
+# Full-text search API
+SEARCH_COLUMNS = ('hostname', 'vendor', 'os_info', 'services', 'vulnerabilities', 'notes')
+# bm25 weight per SEARCH_COLUMNS entry: a hit in a hostname ranks above one in notes
+SEARCH_COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 2.0, 2.0, 1.0)
+SEARCH_PAGE_SIZE = 20
+SEARCH_PAGE_SIZE_MAX = 100
+SEARCH_SNIPPET_TOKENS = 16
+# Placeholders snippet() puts around matches, swapped for <mark> tags once the text is escaped
+SNIPPET_MARK_START, SNIPPET_MARK_END = '\x02', '\x03'
+
+# Service query API
+SERVICE_PAGE_SIZE = 100
+SERVICE_PAGE_SIZE_MAX = 1000
+
+# Subnet overview API: default prefix lengths and optional labels such as
+# NMAPPING_SUBNET_LABELS="10.10.10.0/24=VLAN 10 IoT;10.20.20.0/24=VLAN 20 Main LAN"
+SUBNET_PREFIX = 24
+SUBNET_PREFIX6 = 64
+SUBNET_LABELS = [
+    (ipaddress.ip_network(network.strip(), strict=False), label.strip())
+    for network, label in (
+        entry.split('=', 1) for entry in os.environ.get('NMAPPING_SUBNET_LABELS', '').split(';') if '=' in entry
+    )
+]
+
+# Topology API: devices are clustered by subnet, VLAN label or vendor, and
+# a cluster's devices are only sent once it is expanded
+TOPOLOGY_GROUPS = ('subnet', 'vlan', 'vendor')
+TOPOLOGY_EXPAND_MAX = 500
+# Layout distances in vis-network canvas units
+TOPOLOGY_NODE_SPACING = 40
+TOPOLOGY_CLUSTER_SPACING = 400
+# Golden angle in radians: successive spiral positions never line up
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+# Time-series metrics: one sample per sync, summed at write time into raw
+# (per second), hourly and daily buckets and averaged per bucket when read
+METRICS_COLUMNS = ('total_devices', 'online_devices', 'offline_devices', 'recently_seen',
+                   'inactive_devices', 'unknown_devices', 'devices_found', 'new_devices')
+METRICS_RESOLUTIONS = {'raw': 1, 'hour': 3600, 'day': 86400}
+# Days each resolution is kept, 0 keeps it forever
+METRICS_RETENTION_DAYS = {
+    'raw': int(os.environ.get('NMAPPING_METRICS_RAW_DAYS', '7')),
+    'hour': int(os.environ.get('NMAPPING_METRICS_HOURLY_DAYS', '90')),
+    'day': int(os.environ.get('NMAPPING_METRICS_DAILY_DAYS', '0')),
+}
+# Range returned when no since= is given
+METRICS_DEFAULT_SPAN = {'raw': 86400, 'hour': 7 * 86400, 'day': 365 * 86400}
+
+# Socket.IO deltas kept for clients catching up after missed events
+DELTA_HISTORY = 100
+# Larger changes, e.g. a full first sync or a /16 nmap ingest, are sent as a
+# reload hint instead of device lists; clients then fetch /api/dashboard
+DELTA_MAX_DEVICES = int(os.environ.get('NMAPPING_DELTA_MAX_DEVICES', '5000'))
+# Columns of a parsed device row, in write_device_rows order
+DEVICE_ROW_COLUMNS = ('ip', 'mac', 'vendor', 'hostname', 'first_seen', 'last_seen',
+                      'os_info', 'services', 'vulnerabilities')
+FIRST_SEEN_INDEX = DEVICE_ROW_COLUMNS.index('first_seen')
+LAST_SEEN_INDEX = DEVICE_ROW_COLUMNS.index('last_seen')
+SERVICES_INDEX = DEVICE_ROW_COLUMNS.index('services')
+
+# Device status by how recently it was seen: within 1 day online, 2 days
+# recently seen, 8 days inactive, offline before that, unknown without a date
+STATUS_WINDOWS = (('online', 1), ('recently_seen', 2), ('inactive', 8))
+# first_seen/last_seen strings repeat across devices and syncs
+SEEN_CACHE_SIZE = 4096
+SEEN_DATE_PATTERN = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})(?:[T ](\d{1,2}):(\d{2})(?::(\d{2}))?)?')
+SEEN_SLASH_DATE_PATTERN = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})')
+
+# nmap XML ingestion: the scans row type, and how a scan time is stored in last_seen
+NMAP_SCAN_TYPE = 'nmap'
+NMAP_SCAN_TYPE_PATTERN = re.compile(r'^[a-z][a-z0-9_-]{0,31}$')
+NMAP_LAST_SEEN_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Device status -> dashboard stats key
+STATUS_STATS_KEYS = {
+    'online': 'online_devices',
+    'offline': 'offline_devices',
+    'recently_seen': 'recently_seen',
+    'inactive': 'inactive_devices',
+    'unknown': 'unknown_devices',
+}
+
+# Prometheus metrics, served on /metrics
+registry = MetricsRegistry()
+SYNC_SECONDS = registry.histogram('nmapping_sync_duration_seconds', 'Duration of scanner syncs', ['mode'])
+SYNCS = registry.counter('nmapping_syncs_total', 'Scanner syncs by outcome', ['mode', 'result'])
+SYNC_GIT_PULL_SECONDS = registry.histogram('nmapping_sync_git_pull_duration_seconds',
+                                           'Duration of git pull in the scanner repository')
+SYNC_FILES_PARSED = registry.counter('nmapping_sync_files_parsed_total', 'Device files parsed by syncs')
+SYNC_FILE_PARSE_SECONDS = registry.histogram(
+    'nmapping_sync_file_parse_duration_seconds', 'Time to parse one device file',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+SYNC_DB_WRITE_SECONDS = registry.histogram('nmapping_sync_db_write_duration_seconds',
+                                           'Time to write one batch of device rows')
+SYNC_DB_COMMIT_SECONDS = registry.histogram('nmapping_sync_db_commit_duration_seconds', 'Time to commit a sync')
+SYNC_ROWS_WRITTEN = registry.counter('nmapping_sync_rows_written_total', 'Device and scan rows written by syncs')
+DASHBOARD_QUERY_SECONDS = registry.histogram('nmapping_dashboard_query_duration_seconds',
+                                             'Time to query the dashboard payload')
+DASHBOARD_SERIALIZE_SECONDS = registry.histogram('nmapping_dashboard_serialize_duration_seconds',
+                                                 'Time to serialize the dashboard payload to JSON')
+DASHBOARD_PAYLOAD_BYTES = registry.gauge('nmapping_dashboard_payload_bytes', 'Size of the cached dashboard payload')
+SOCKETIO_CLIENTS = registry.gauge('nmapping_socketio_clients', 'Connected Socket.IO clients')
+SOCKETIO_EMITS = registry.counter('nmapping_socketio_emits_total', 'Socket.IO events emitted', ['event'])
+SOCKETIO_MESSAGES = registry.counter('nmapping_socketio_messages_total',
+                                     'Socket.IO messages sent, one per receiving client', ['event'])
+SOCKETIO_BYTES = registry.counter('nmapping_socketio_payload_bytes_total',
+                                  'JSON payload bytes sent over Socket.IO, summed over receiving clients', ['event'])
+HTTP_REQUEST_SECONDS = registry.histogram('nmapping_http_request_duration_seconds',
+                                          'HTTP request latency until the response is returned',
+                                          ['method', 'endpoint', 'status'])
+DEVICES = registry.gauge('nmapping_devices', 'Devices by status', ['status'])
+DB_POOL_CONNECTIONS = registry.gauge('nmapping_db_pool_connections', 'Pooled SQLite connections by state',
+                                     ['pool', 'state'])
+DB_POOL_EVENTS = registry.counter('nmapping_db_pool_events_total',
+                                  'Connection pool checkouts: acquired, reused, waited, timeouts, discarded',
+                                  ['pool', 'event'])
+SYNC_CONSECUTIVE_FAILURES = registry.gauge('nmapping_sync_consecutive_failures',
+                                           'Failed syncs since the last success')
+SYNC_LEADER = registry.gauge('nmapping_sync_leader', 'Whether this worker process runs the syncs')
+NMAP_INGEST_SECONDS = registry.histogram('nmapping_nmap_ingest_duration_seconds',
+                                         'Duration of nmap XML ingests', buckets=(1, 5, 10, 30, 60, 300, 900, 3600))
+NMAP_INGEST_HOSTS = registry.counter('nmapping_nmap_ingest_hosts_total',
+                                     'Hosts read from nmap XML: added, updated or unchanged', ['result'])
+
+def ip_sort_key(ip):
+    """16-byte big-endian address (IPv4 as IPv4-mapped IPv6) that sorts numerically, or None"""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    if address.version == 4:
+        address = ipaddress.IPv6Address(b'\0' * 10 + b'\xff\xff' + address.packed)
+    return address.packed
+
+def ip_from_sort_key(key):
+    """Inverse of ip_sort_key"""
+    address = ipaddress.IPv6Address(key)
+    return address.ipv4_mapped or address
+
+def cidr_key_range(cidr):
+    """(low, high) ip_sort_key bounds of a CIDR block such as 10.20.0.0/16"""
+    network = ipaddress.ip_network(cidr, strict=False)
+    return ip_sort_key(network.network_address), ip_sort_key(network.broadcast_address)
+
+# ip_key bounds of all IPv4 addresses
+IPV4_KEY_RANGE = cidr_key_range('0.0.0.0/0')
+
+@functools.lru_cache(maxsize=SEEN_CACHE_SIZE)
+def parse_seen(value):
+    """Epoch seconds of a first/last seen value, local time, or None if it is not a date
+
+    Takes YYYY-MM-DD with an optional HH:MM[:SS], and DD/MM/YYYY or
+    MM/DD/YYYY (day first when both are valid). A date alone is midnight.
+    """
+    value = (value or '').strip()
+    match = SEEN_DATE_PATTERN.match(value)
+    if match:
+        candidates = [[int(part or 0) for part in match.groups()]]
+    else:
+        match = SEEN_SLASH_DATE_PATTERN.match(value)
+        if not match:
+            return None
+        first, second, year = (int(part) for part in match.groups())
+        candidates = [[year, second, first], [year, first, second]]
+    for parts in candidates:
+        try:
+            return int(datetime(*parts).timestamp())
+        except (ValueError, OverflowError):
+            continue
+    return None
+
+def status_bounds(now):
+    """(status, bound) pairs, newest first: a device has the first status whose bound its last_seen_at exceeds"""
+    return [(status, int(now) - days * 86400) for status, days in STATUS_WINDOWS]
+
+def device_status(seen_at, now):
+    """Status at epoch now of a device last seen at epoch seen_at"""
+    if seen_at is None:
+        return 'unknown'
+    for status, bound in status_bounds(now):
+        if seen_at > bound:
+            return status
+    return 'offline'
+
+def status_sql(now, column='last_seen_at'):
+    """SQL expression for the status of a device at epoch now"""
+    cases = ' '.join(f"WHEN {column} > {bound} THEN '{status}'" for status, bound in status_bounds(now))
+    return f"CASE WHEN {column} IS NULL THEN 'unknown' {cases} ELSE 'offline' END"
+
+def status_condition(status, now):
+    """(SQL predicate, params) matching devices in one status, as a range over last_seen_at"""
+    if status == 'unknown':
+        return 'last_seen_at IS NULL', []
+    bounds = status_bounds(now)
+    if status == 'offline':
+        return 'last_seen_at <= ?', [bounds[-1][1]]
+    for index, (name, bound) in enumerate(bounds):
+        if name == status:
+            if index == 0:
+                return 'last_seen_at > ?', [bound]
+            return 'last_seen_at > ? AND last_seen_at <= ?', [bound, bounds[index - 1][1]]
+    raise ValueError(f"Unknown status: {status}")
+
+def device_columns(fields, now, table=''):
+    """SELECT list for device fields, with status computed at epoch now"""
+    prefix = f'{table}.' if table else ''
+    return ', '.join(
+        f"{status_sql(now, prefix + 'last_seen_at')} AS status" if field == 'status' else prefix + field
+        for field in fields
+    )
+
+def columnar_payload(data):
+    """Dashboard payload with devices as one array per field instead of one object per device"""
+    fields = list(data['devices'][0]) if data['devices'] else list(DEVICE_COLUMNS)
+    return {**data, 'layout': 'columnar',
+            'devices': {field: [device[field] for device in data['devices']] for field in fields}}
+
+def compress_body(body, encoding):
+    """Body as bytes, compressed with a Content-Encoding from negotiate_encoding()"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+    return body
+
+def mark_snippet(text):
+    """HTML-escape an FTS snippet, then turn its match placeholders into <mark> tags"""
+    text = html.escape(text or '')
+    return text.replace(SNIPPET_MARK_START, '<mark>').replace(SNIPPET_MARK_END, '</mark>')
+
+
+def spiral_position(index, spacing, offset=0):
+    """(x, y) of the index-th point of a sunflower spiral, evenly about spacing apart"""
+    radius = spacing * math.sqrt(index + offset)
+    angle = index * GOLDEN_ANGLE
+    return round(radius * math.cos(angle), 1), round(radius * math.sin(angle), 1)
+
+def parse_epoch(value):
+    """Epoch seconds of a time such as 2026-10-01 or 2026-10-01T12:00:00Z, UTC unless an offset is given"""
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid time: {value}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def format_epoch(seconds):
+    """Inverse of parse_epoch, as 2026-10-01T12:00:00Z"""
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def new_change_set():
+    """Empty record of the devices and scans touched by one ingest"""
+    return {'added': set(), 'updated': set(), 'removed': set(), 'scans': False}
+
 class NetworkDashboard:
     def __init__(self):
         self.db_path = DATABASE_PATH
+        self.parser = DeviceMarkdownParser()
+        self.nmap_parser = NmapXMLParser()
+        # Device parsing workers, see start_parse_pool()
+        self.parse_pool = None
+        self.snapshot = None
+        # Epoch time at which a device in the snapshot changes status
+        self.snapshot_expires = None
+        # Other formats and compressed bodies of the snapshot, keyed by ETag
+        self.snapshot_cache = {}
+        self.snapshot_lock = threading.Lock()
+        # Topology graphs by grouping, rebuilt after data changes; cluster slots
+        # outlive rebuilds so that existing clusters keep their position
+        self.topology = {}
+        self.topology_slots = {}
+        self.topology_lock = threading.Lock()
+        # Delta sequence and history, shared with the other worker processes
+        self.worker_state = WorkerState(WORKER_STATE_PATH, delta_history=DELTA_HISTORY,
+                                        job_history=SYNC_JOB_HISTORY, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS)
+        # Held around write transactions that read rows before upserting them
+        # (syncs and nmap XML ingests), so that neither works from a stale read
+        self.write_lock = threading.Lock()
+        # Called with each devices delta, e.g. to broadcast it over Socket.IO
+        self.on_delta = None
+        # Context manager wrapped around git pull, to keep the file watcher
+        # from reporting the files the pull writes; it yields a set to add
+        # their names to
+        self.suppress_watch = lambda: nullcontext(set())
+        # synchronous and cache_size are per-connection settings, applied to
+        # every pooled connection when it is opened
+        pragmas = (f'synchronous = {SQLITE_SYNCHRONOUS}', f'cache_size = -{SQLITE_CACHE_SIZE_KB}')
+        self.writers = ConnectionPool(self.db_path, SQLITE_WRITE_POOL_SIZE, timeout=SQLITE_POOL_TIMEOUT,
+                                      busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS, pragmas=pragmas)
+        self.readers = ConnectionPool(self.db_path, SQLITE_READ_POOL_SIZE, readonly=True,
+                                      timeout=SQLITE_POOL_TIMEOUT, busy_timeout_ms=SQLITE_BUSY_TIMEOUT_MS,
+                                      pragmas=pragmas)
         self.init_database()
     
-    def get_db_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
-    
+    def connection(self, readonly=False):
+        """Borrow a pooled connection: with dashboard.connection(readonly=True) as conn: ...
+
+        API handlers read through the read-only pool; the sync path stays on
+        the read-write pool so request load never delays a sync.
+        """
+        return (self.readers if readonly else self.writers).connection()
+
+    def get_pool_stats(self):
+        """Occupancy and counters of both connection pools"""
+        return {'read_only': self.readers.stats(), 'read_write': self.writers.stats()}
+
     def init_database(self):
         """Initialize database tables if they don't exist"""
-        conn = self.get_db_connection()
-        
+        with self.connection() as conn:
+            self.create_tables(conn)
+            conn.commit()
+
+    def create_tables(self, conn):
+        """Create tables and indexes that don't exist yet"""
+        # WAL is persistent: readers no longer block on sync writes and each
+        # commit appends to the log instead of rewriting the rollback journal.
+        # The read-only pool relies on it, as it cannot create the WAL files
+        conn.execute('PRAGMA journal_mode = WAL')
+
         # Create tables if they don't exist
         conn.execute('''
             CREATE TABLE IF NOT EXISTS devices (
@@ -56,7 +488,8 @@ class NetworkDashboard:
                 hostname TEXT,
                 first_seen TEXT,
                 last_seen TEXT,
-                status TEXT DEFAULT 'unknown',
+                first_seen_at INTEGER,
+                last_seen_at INTEGER,
                 os_info TEXT,
                 services TEXT,
                 vulnerabilities TEXT,
@@ -69,180 +502,786 @@ class NetworkDashboard:
         conn.execute('''
             CREATE INDEX IF NOT EXISTS idx_devices_ip ON devices(ip)
         ''')
-        
+
+        # Numeric form of ip for CIDR range queries and numeric ordering
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(devices)')}
+        if 'ip_key' not in columns:
+            conn.execute('ALTER TABLE devices ADD COLUMN ip_key BLOB')
+            conn.executemany('UPDATE devices SET ip_key = ? WHERE id = ?', [
+                (ip_sort_key(row['ip']), row['id']) for row in conn.execute('SELECT id, ip FROM devices')
+            ])
+
         conn.execute('''
-            CREATE INDEX IF NOT EXISTS idx_devices_status ON devices(status)
+            CREATE INDEX IF NOT EXISTS idx_devices_ip_key ON devices(ip_key, ip)
         ''')
-        
+
+        # Epoch forms of first_seen/last_seen; status used to be stored at
+        # ingest time and went stale, it is now computed from last_seen_at
+        if 'last_seen_at' not in columns:
+            conn.execute('ALTER TABLE devices ADD COLUMN first_seen_at INTEGER')
+            conn.execute('ALTER TABLE devices ADD COLUMN last_seen_at INTEGER')
+            conn.executemany('UPDATE devices SET first_seen_at = ?, last_seen_at = ? WHERE id = ?', [
+                (parse_seen(row['first_seen']), parse_seen(row['last_seen']), row['id'])
+                for row in conn.execute('SELECT id, first_seen, last_seen FROM devices')
+            ])
+        conn.execute('DROP INDEX IF EXISTS idx_devices_status')
+        conn.execute('DROP INDEX IF EXISTS idx_devices_last_seen')
+        conn.execute('DROP INDEX IF EXISTS idx_devices_last_seen_ip')
+        if 'status' in columns and sqlite3.sqlite_version_info >= (3, 35, 0):
+            conn.execute('ALTER TABLE devices DROP COLUMN status')
+
+        # Matches the device list order so keyset pages stop after LIMIT rows,
+        # and serves the per-status range counts
         conn.execute('''
-            CREATE INDEX IF NOT EXISTS idx_devices_last_seen ON devices(last_seen)
+            CREATE INDEX IF NOT EXISTS idx_devices_last_seen_at_ip ON devices(last_seen_at DESC, ip ASC)
         ''')
-        
-        conn.close()
+
+        # Write counter for incremental exports: updated_at only has whole
+        # seconds, so rows written later in the same second as an export's
+        # watermark could not be told apart from the ones it included
+        if 'change_seq' not in columns:
+            conn.execute('ALTER TABLE devices ADD COLUMN change_seq INTEGER')
+            conn.executemany('UPDATE devices SET change_seq = ? WHERE id = ?', [
+                (sequence, row['id']) for sequence, row in
+                enumerate(conn.execute('SELECT id FROM devices ORDER BY updated_at, id'), 1)
+            ])
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_devices_change_seq ON devices(change_seq)
+        ''')
+
+        # since= exports given a time read only rows updated after it
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_devices_updated_at ON devices(updated_at)
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS scans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_type TEXT NOT NULL,
+                scan_date TEXT NOT NULL,
+                devices_found INTEGER DEFAULT 0,
+                new_devices INTEGER DEFAULT 0,
+                scan_file TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(scan_type, scan_date)
+            )
+        ''')
+
+        # Append-only field-level history of device upserts and removals
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS device_changes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ip TEXT NOT NULL,
+                change_type TEXT NOT NULL,
+                field TEXT,
+                old_value TEXT,
+                new_value TEXT,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_device_changes_ip_changed_at ON device_changes(ip, changed_at)
+        ''')
+
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_device_changes_changed_at ON device_changes(changed_at)
+        ''')
+
+        # One row per port parsed from devices.services, rewritten whenever a
+        # device's services text changes
+        has_services = conn.execute('''
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'services'
+        ''').fetchone()
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS services (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_id INTEGER NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+                port INTEGER NOT NULL,
+                protocol TEXT NOT NULL DEFAULT 'tcp',
+                state TEXT NOT NULL DEFAULT 'open',
+                name TEXT,
+                version TEXT,
+                UNIQUE(device_id, port, protocol)
+            )
+        ''')
+
+        # "Which hosts have 22/tcp open": equality on all three columns, rows
+        # come back in device_id order for paging
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_services_port_protocol_state
+            ON services(port, protocol, state, device_id)
+        ''')
+
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_services_state_port ON services(state, port)
+        ''')
+
+        if not has_services:
+            self.backfill_services(conn)
+
+        self.search_available = self.create_search_index(conn)
+
+        # Per-sync samples summed into buckets; bucket is the bucket start in
+        # epoch seconds (UTC) and resolution a METRICS_RESOLUTIONS name
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS metrics (
+                resolution TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                {', '.join(f'{column} INTEGER NOT NULL' for column in METRICS_COLUMNS)},
+                PRIMARY KEY (resolution, bucket)
+            ) WITHOUT ROWID
+        ''')
+
+        # Incremental sync bookkeeping: last synced commit and, for scanner
+        # directories that are not Git repositories, per-file fingerprints
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS file_fingerprints (
+                filename TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+
+    def create_search_index(self, conn):
+        """Create the devices_fts full-text index and its triggers, returns False without FTS5"""
+        has_index = conn.execute('''
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'devices_fts'
+        ''').fetchone()
+
+        columns = ', '.join(SEARCH_COLUMNS)
+        old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+        new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+        try:
+            # External content table: the text lives in devices, the index only
+            # stores terms and is kept in step by the triggers below
+            conn.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS devices_fts USING fts5(
+                    {columns}, content='devices', content_rowid='id'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"{PROJECT_NAME}: Full-text search disabled, SQLite lacks FTS5: {e}")
+            return False
+
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS devices_fts_insert AFTER INSERT ON devices BEGIN
+                INSERT INTO devices_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        ''')
+
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS devices_fts_delete AFTER DELETE ON devices BEGIN
+                INSERT INTO devices_fts (devices_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END
+        ''')
+
+        # Upserts rewrite every column, so only reindex when searchable text changed
+        changed = ' OR '.join(f'old.{column} IS NOT new.{column}' for column in SEARCH_COLUMNS)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS devices_fts_update AFTER UPDATE ON devices WHEN {changed} BEGIN
+                INSERT INTO devices_fts (devices_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO devices_fts (rowid, {columns}) VALUES (new.id, {new_values});
+            END
+        ''')
+
+        if not has_index:
+            conn.execute("INSERT INTO devices_fts (devices_fts) VALUES ('rebuild')")
+        return True
+
+    def backfill_services(self, conn):
+        """Populate the services table from devices stored before it existed"""
+        devices = conn.execute("SELECT id, services FROM devices WHERE services != ''").fetchall()
+        conn.executemany('''
+            INSERT INTO services (device_id, port, protocol, state, name, version)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (device['id'], *entry)
+            for device in devices
+            for entry in self.parser.parse_service_entries(device['services'])
+        ])
+        if devices:
+            print(f"{PROJECT_NAME}: Indexed services of {len(devices)} existing devices")
     
-    def sync_from_scanner_data(self):
-        """Sync data from scanner Git repository"""
+    def sync_from_scanner_data(self, progress=None, files=None):
+        """Sync data from scanner Git repository
+
+        progress(stage, **details) is called as the sync moves through its stages.
+        files limits the sync to those vault file names (e.g. reported by the
+        file watcher) and skips the pull and diff.
+        Run syncs through the SyncScheduler so that only one runs at a time.
+        """
+        progress = progress or (lambda stage, **details: None)
         if not os.path.exists(SCANNER_DATA_PATH):
             print(f"{PROJECT_NAME}: Scanner data path not found: {SCANNER_DATA_PATH}")
+            progress('error', error=f'Scanner data path not found: {SCANNER_DATA_PATH}')
             return False
         
+        mode = 'full' if files is None else 'files'
+        sync_start = time.perf_counter()
         try:
-            # Pull latest changes
-            subprocess.run(['git', 'pull'], cwd=SCANNER_DATA_PATH, check=True, capture_output=True)
-            
-            # Process markdown files
-            self.process_device_files()
-            self.process_scan_summaries()
-            
-            print(f"{PROJECT_NAME}: Data sync completed successfully")
+            commit = None
+            fingerprints = None
+            if files is not None:
+                changed, deleted, fingerprints = self.get_touched_files(files)
+            elif self.is_git_repository():
+                # Pull latest changes
+                progress('pulling')
+                with SYNC_GIT_PULL_SECONDS.time(), self.suppress_watch() as pulled:
+                    before = self.run_git('rev-parse', 'HEAD').strip()
+                    subprocess.run(['git', 'pull'], cwd=SCANNER_DATA_PATH, check=True, capture_output=True)
+                    pulled |= self.get_changed_paths(before)
+                progress('diffing')
+                changed, deleted, commit = self.get_git_changes()
+            else:
+                progress('diffing')
+                changed, deleted, fingerprints = self.get_fingerprint_changes()
+
+            # Process only the markdown files that changed since the last sync,
+            # writing everything in a single transaction
+            start = time.perf_counter()
+            changes = new_change_set()
+            # Files that could not be parsed are retried by the next sync
+            failed = set()
+            with self.write_lock, self.connection() as conn, conn:
+                self.record_status_changes(conn)
+                self.remove_deleted_files(conn, deleted, changes)
+                rows = self.process_device_files(conn, changed, changes, progress, failed)
+                rows += self.process_scan_summaries(conn, changed, changes, failed)
+                self.save_sync_checkpoint(conn, commit, fingerprints, changed - failed, deleted, failed)
+                self.record_metrics(conn)
+                with SYNC_DB_COMMIT_SECONDS.time():
+                    conn.commit()
+            elapsed = time.perf_counter() - start
+            SYNC_ROWS_WRITTEN.inc(rows)
+
+            progress('publishing')
+            self.publish_changes(changes)
+
+            print(f"{PROJECT_NAME}: Data sync completed successfully "
+                  f"({len(changed)} changed, {len(deleted)} deleted, {rows} rows in {elapsed:.2f}s, "
+                  f"{rows / elapsed if elapsed else 0:.0f} rows/sec)")
+            if failed:
+                print(f"{PROJECT_NAME}: {len(failed)} files failed to parse and will be retried next sync")
+            progress('done', changed=len(changed), deleted=len(deleted), rows=rows)
+            SYNCS.inc(mode=mode, result='success')
             return True
         except Exception as e:
             print(f"{PROJECT_NAME}: Error syncing data: {e}")
+            progress('error', error=str(e))
+            SYNCS.inc(mode=mode, result='failure')
             return False
-    
-    def process_device_files(self):
-        """Process individual device markdown files"""
-        conn = self.get_db_connection()
-        
+        finally:
+            SYNC_SECONDS.observe(time.perf_counter() - sync_start, mode=mode)
+
+    def run_git(self, *args):
+        """Run a git command in the scanner data directory and return its output"""
+        result = subprocess.run(['git', *args], cwd=SCANNER_DATA_PATH, check=True,
+                                capture_output=True, text=True)
+        return result.stdout
+
+    def is_git_repository(self):
+        """Check whether the scanner data directory is a Git work tree"""
+        try:
+            return self.run_git('rev-parse', '--is-inside-work-tree').strip() == 'true'
+        except (subprocess.CalledProcessError, OSError):
+            return False
+
+    def is_scanner_file(self, filename):
+        """Check whether a file name is a device or scan summary file"""
+        if DEVICE_FILE_PATTERN.match(filename):
+            return ip_sort_key(filename[:-len('.md')]) is not None
+        return bool(SCAN_FILE_PATTERN.match(filename))
+
+    def list_scanner_files(self):
+        """List all device and scan summary files in the scanner data directory"""
+        return {file for file in os.listdir(SCANNER_DATA_PATH) if self.is_scanner_file(file)}
+
+    def get_sync_state(self, key):
+        """Read a value from the sync state table"""
+        with self.connection() as conn:
+            row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def get_git_changes(self):
+        """Return (changed, deleted, head) file names since the last synced commit"""
+        head = self.run_git('rev-parse', 'HEAD').strip()
+        last_commit = self.get_sync_state('last_commit')
+
+        if not last_commit:
+            return self.list_scanner_files(), set(), head
+
+        changed, deleted = set(), set()
+        if last_commit != head:
+            try:
+                output = self.run_git('diff', '--name-status', '--no-renames', '--relative', '-z',
+                                      last_commit, head)
+            except subprocess.CalledProcessError:
+                # Last synced commit is gone (e.g. history rewritten), resync everything
+                print(f"{PROJECT_NAME}: Last synced commit {last_commit} not found, running full sync")
+                return self.list_scanner_files(), set(), head
+
+            fields = output.split('\0')
+            for status, path in zip(fields[0::2], fields[1::2]):
+                # Only top-level vault files are ingested
+                if '/' in path or not self.is_scanner_file(path):
+                    continue
+                if status == 'D':
+                    deleted.add(path)
+                else:
+                    changed.add(path)
+
+        # Files an earlier sync failed to parse, unless they are gone since
+        for file in json.loads(self.get_sync_state('retry_files') or '[]'):
+            if file not in deleted and os.path.exists(os.path.join(SCANNER_DATA_PATH, file)):
+                changed.add(file)
+        return changed, deleted, head
+
+    def get_changed_paths(self, commit):
+        """Names of the files that differ between a commit and HEAD"""
+        output = self.run_git('diff', '--name-only', '--no-renames', '--relative', '-z', commit, 'HEAD')
+        return {path for path in output.split('\0') if path}
+
+    def get_touched_files(self, files):
+        """Return (changed, deleted, fingerprints) for files known to have been touched"""
+        changed, deleted, fingerprints = set(), set(), {}
+        for file in files:
+            if not self.is_scanner_file(file):
+                continue
+            try:
+                stat = os.stat(os.path.join(SCANNER_DATA_PATH, file))
+            except FileNotFoundError:
+                deleted.add(file)
+                continue
+            changed.add(file)
+            fingerprints[file] = (stat.st_mtime_ns, stat.st_size)
+        # Keep the fingerprints current so the next full sync does not reparse
+        # these files; Git-backed vaults track the synced commit instead
+        if self.get_sync_state('last_commit'):
+            fingerprints = None
+        return changed, deleted, fingerprints
+
+    def get_fingerprint_changes(self):
+        """Return (changed, deleted, fingerprints) using file mtime and size"""
+        with self.connection() as conn:
+            known = {
+                row['filename']: (row['mtime_ns'], row['size'])
+                for row in conn.execute('SELECT filename, mtime_ns, size FROM file_fingerprints')
+            }
+
+        fingerprints = {}
+        with os.scandir(SCANNER_DATA_PATH) as entries:
+            for entry in entries:
+                if entry.is_file() and self.is_scanner_file(entry.name):
+                    stat = entry.stat()
+                    fingerprints[entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+        changed = {file for file, fingerprint in fingerprints.items() if known.get(file) != fingerprint}
+        deleted = set(known) - set(fingerprints)
+        return changed, deleted, fingerprints
+
+    def remove_deleted_files(self, conn, deleted, changes):
+        """Remove database rows for device and scan files deleted from the vault"""
+        if not deleted:
+            return
+
+        ips = [file[:-len('.md')] for file in deleted if DEVICE_FILE_PATTERN.match(file)]
+        scan_files = [file for file in deleted if SCAN_FILE_PATTERN.match(file)]
+        conn.executemany('''
+            INSERT INTO device_changes (ip, change_type)
+            SELECT ip, 'removed' FROM devices WHERE ip = ?
+        ''', [(ip,) for ip in ips])
+        # Foreign keys are not enforced, so cascade by hand
+        conn.executemany('''
+            DELETE FROM services WHERE device_id IN (SELECT id FROM devices WHERE ip = ?)
+        ''', [(ip,) for ip in ips])
+        conn.executemany('DELETE FROM devices WHERE ip = ?', [(ip,) for ip in ips])
+        conn.executemany('DELETE FROM scans WHERE scan_file = ?', [(file,) for file in scan_files])
+        changes['removed'].update(ips)
+        changes['scans'] = changes['scans'] or bool(scan_files)
+
+        print(f"{PROJECT_NAME}: Removed {len(deleted)} deleted files")
+
+    def record_metrics(self, conn, now=None):
+        """Add a sample of the device counts and latest scan to every metrics resolution
+
+        Hourly and daily buckets are updated in place rather than rolled up
+        from raw rows later; buckets past their retention are then dropped.
+        """
+        now = int(time.time() if now is None else now)
+        sample = self.get_stats(conn)
+        scan = conn.execute('''
+            SELECT devices_found, new_devices FROM scans ORDER BY scan_date DESC, id DESC LIMIT 1
+        ''').fetchone()
+        sample['devices_found'] = scan['devices_found'] if scan else 0
+        sample['new_devices'] = scan['new_devices'] if scan else 0
+        values = [sample[column] or 0 for column in METRICS_COLUMNS]
+
+        columns = ', '.join(METRICS_COLUMNS)
+        placeholders = ', '.join('?' * len(METRICS_COLUMNS))
+        sums = ', '.join(f'{column} = {column} + excluded.{column}' for column in METRICS_COLUMNS)
+        for resolution, width in METRICS_RESOLUTIONS.items():
+            conn.execute(f'''
+                INSERT INTO metrics (resolution, bucket, samples, {columns}) VALUES (?, ?, 1, {placeholders})
+                ON CONFLICT(resolution, bucket) DO UPDATE SET samples = samples + 1, {sums}
+            ''', [resolution, now - now % width] + values)
+
+            days = METRICS_RETENTION_DAYS[resolution]
+            if days > 0:
+                conn.execute('DELETE FROM metrics WHERE resolution = ? AND bucket < ?',
+                             (resolution, now - days * 86400))
+
+    def record_status_changes(self, conn, now=None):
+        """Append status changes of devices that aged past a status window since the last check
+
+        Run before device rows are written, so a device written afterwards
+        starts from its status at now.
+        """
+        now = int(time.time() if now is None else now)
+        row = conn.execute("SELECT value FROM sync_state WHERE key = 'status_checked_at'").fetchone()
+        checked = int(row['value']) if row else now
+        if checked < now:
+            # Each window bound moved forward by now - checked; the devices it
+            # passed over are the ones whose status changed
+            ranges = [(old, new) for (_, old), (_, new) in zip(status_bounds(checked), status_bounds(now))]
+            where = ' OR '.join('(last_seen_at > ? AND last_seen_at <= ?)' for _ in ranges)
+            conn.execute(f'''
+                INSERT INTO device_changes (ip, change_type, field, old_value, new_value)
+                SELECT ip, 'updated', 'status', old_status, new_status FROM (
+                    SELECT ip, {status_sql(checked)} AS old_status, {status_sql(now)} AS new_status
+                    FROM devices WHERE {where}
+                ) WHERE old_status != new_status
+            ''', [bound for pair in ranges for bound in pair])
+        conn.execute('''
+            INSERT OR REPLACE INTO sync_state (key, value, updated_at)
+            VALUES ('status_checked_at', ?, CURRENT_TIMESTAMP)
+        ''', (str(max(checked, now)),))
+
+    def save_sync_checkpoint(self, conn, commit, fingerprints, changed, deleted, failed=()):
+        """Record the synced commit or file fingerprints for the next incremental sync
+
+        changed should leave out the failed files: without a fingerprint they
+        show up as changed again, and with a commit they are kept as
+        retry_files for the next diff.
+        """
+        if commit:
+            conn.executemany('''
+                INSERT OR REPLACE INTO sync_state (key, value, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            ''', [('last_commit', commit), ('retry_files', json.dumps(sorted(failed)))])
+        if fingerprints is not None:
+            conn.executemany('DELETE FROM file_fingerprints WHERE filename = ?',
+                             [(file,) for file in deleted])
+            conn.executemany('''
+                INSERT OR REPLACE INTO file_fingerprints (filename, mtime_ns, size)
+                VALUES (?, ?, ?)
+            ''', [(file, *fingerprints[file]) for file in changed])
+
+    def process_device_files(self, conn, files=None, changes=None, progress=None, failed=None):
+        """Parse device markdown files and upsert them in batches, returns rows written
+
+        Files that fail to parse are added to the failed set, if given.
+        """
+        if files is None:
+            files = os.listdir(SCANNER_DATA_PATH)
+
         # Find all device IP files
+        start = time.perf_counter()
         device_count = 0
-        for file in os.listdir(SCANNER_DATA_PATH):
-            if re.match(r'^\d+\.\d+\.\d+\.\d+\.md$', file):
-                ip = file.replace('.md', '')
-                self.process_device_file(conn, ip, os.path.join(SCANNER_DATA_PATH, file))
-                device_count += 1
-        
-        print(f"{PROJECT_NAME}: Processed {device_count} device files")
-        conn.close()
-    
+        rows = []
+        device_files = [file for file in sorted(files) if DEVICE_FILE_PATTERN.match(file) and self.is_scanner_file(file)]
+        ips = [file.replace('.md', '') for file in device_files]
+        paths = [os.path.join(SCANNER_DATA_PATH, file) for file in device_files]
+        for index, row in enumerate(self.parse_device_files(ips, paths)):
+            if row:
+                rows.append(row)
+            elif failed is not None:
+                failed.add(device_files[index])
+            if len(rows) >= SYNC_BATCH_SIZE:
+                with SYNC_DB_WRITE_SECONDS.time():
+                    self.write_device_rows(conn, rows, changes)
+                device_count += len(rows)
+                rows = []
+                if progress:
+                    progress('ingesting', processed=index + 1, total=len(device_files))
+        with SYNC_DB_WRITE_SECONDS.time():
+            self.write_device_rows(conn, rows, changes)
+        device_count += len(rows)
+        SYNC_FILES_PARSED.inc(len(device_files))
+        elapsed = time.perf_counter() - start
+
+        print(f"{PROJECT_NAME}: Processed {device_count} device files in {elapsed:.2f}s "
+              f"({device_count / elapsed if elapsed else 0:.0f} rows/sec)")
+        return device_count
+
+    def start_parse_pool(self):
+        """Fork the device parsing workers; call it before the process starts any thread
+
+        Children must be forked: spawned ones would re-import this module and
+        re-run its start-up side effects. A child forked while another thread
+        holds a lock (stdout, logging, a connection pool) inherits the lock
+        held and can hang, so the workers are forked once, up front, and
+        every sync reuses them.
+        """
+        if (self.parse_pool is not None or SYNC_PARSE_WORKERS <= 1
+                or 'fork' not in multiprocessing.get_all_start_methods()):
+            return
+        self.parse_pool = ProcessPoolExecutor(max_workers=SYNC_PARSE_WORKERS,
+                                              mp_context=multiprocessing.get_context('fork'))
+        # With fork, the executor forks all of its workers when the first task
+        # is submitted
+        self.parse_pool.submit(int)
+
+    def parse_device_files(self, ips, paths):
+        """Yield parsed device rows in order, using the parsing pool for large batches"""
+        if self.parse_pool is None or len(paths) < SYNC_PARALLEL_THRESHOLD:
+            for ip, path in zip(ips, paths):
+                with SYNC_FILE_PARSE_SECONDS.time():
+                    row = parse_device_file(ip, path)
+                yield row
+            return
+
+        # Workers only parse and return plain tuples; the calling thread stays
+        # the single owner of the SQLite connection
+        chunksize = max(1, min(64, len(paths) // (SYNC_PARSE_WORKERS * 4)))
+        try:
+            for row, seconds in self.parse_pool.map(timed_parse_device_file, ips, paths, chunksize=chunksize):
+                SYNC_FILE_PARSE_SECONDS.observe(seconds)
+                yield row
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); it cannot be replaced
+            # safely now that threads run, so later syncs parse inline
+            print(f"{PROJECT_NAME}: Device parsing pool failed, parsing in the sync thread from now on")
+            self.parse_pool = None
+            raise
+
     def process_device_file(self, conn, ip, filepath):
         """Process individual device markdown file"""
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Try to parse frontmatter if it exists
-            try:
-                post = frontmatter.loads(content)
-                content = post.content
-                metadata = post.metadata
-            except:
-                metadata = {}
-            
-            # Extract device information using improved regex patterns
-            mac = self.extract_field(content, r'\*\*MAC:\*\*\s*(.+)')
-            vendor = self.extract_field(content, r'\*\*Vendor:\*\*\s*(.+)')
-            hostname = self.extract_field(content, r'\*\*Hostname:\*\*\s*(.+)')
-            first_seen = self.extract_field(content, r'\*\*First Seen:\*\*\s*(.+)')
-            last_seen = self.extract_field(content, r'\*\*Last Seen:\*\*\s*(.+)')
-            
-            # Extract OS and services information
-            os_info = self.extract_section(content, r'## OS & Services')
-            services = self.extract_services(content)
-            vulnerabilities = self.extract_section(content, r'## Vulnerabilities')
-            
-            # Determine status based on last seen date
-            status = self.determine_device_status(last_seen)
-            
-            # Insert or update device with proper error handling
-            conn.execute('''
-                INSERT OR REPLACE INTO devices 
-                (ip, mac, vendor, hostname, first_seen, last_seen, status, os_info, services, vulnerabilities, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (ip, mac, vendor, hostname, first_seen, last_seen, status, os_info, services, vulnerabilities))
-            
+        row = parse_device_file(ip, filepath)
+        if row:
+            changes = new_change_set()
+            self.write_device_rows(conn, [row], changes)
             conn.commit()
-            
-        except Exception as e:
-            print(f"{PROJECT_NAME}: Error processing device file {filepath}: {e}")
-    
-    def extract_field(self, content, pattern):
-        """Extract field using regex pattern"""
-        match = re.search(pattern, content, re.IGNORECASE)
-        if match:
-            value = match.group(1).strip()
-            # Clean up common formatting
-            value = re.sub(r'^\*\*|\*\*$', '', value)  # Remove bold markers
-            return value if value and value != 'Unknown' else ""
-        return ""
-    
-    def extract_section(self, content, section_pattern):
-        """Extract entire section content"""
-        pattern = f"{section_pattern}.*?(?=## |$)"
-        match = re.search(pattern, content, re.DOTALL | re.IGNORECASE)
-        return match.group(0).strip() if match else ""
-    
-    def extract_services(self, content):
-        """Extract services from OS & Services section"""
-        services = []
-        lines = content.split('\n')
-        for line in lines:
-            # Look for port information in various formats
-            if re.search(r'\d+/(tcp|udp)\s+(open|filtered|closed)', line, re.IGNORECASE):
-                services.append(line.strip())
-            elif re.search(r'Port\s+\d+', line, re.IGNORECASE):
-                services.append(line.strip())
-        return '\n'.join(services)
-    
-    def determine_device_status(self, last_seen):
-        """Determine device status based on last seen date"""
-        if not last_seen:
-            return 'unknown'
-        
-        try:
-            # Handle different date formats
-            for fmt in ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%m/%d/%Y']:
-                try:
-                    last_date = datetime.strptime(last_seen.split()[0], fmt)
-                    break
-                except ValueError:
-                    continue
-            else:
-                return 'unknown'
-            
-            days_diff = (datetime.now() - last_date).days
-            
-            if days_diff == 0:
-                return 'online'
-            elif days_diff <= 1:
-                return 'recently_seen'
-            elif days_diff <= 7:
-                return 'inactive'
-            else:
-                return 'offline'
-        except Exception as e:
-            print(f"{PROJECT_NAME}: Error parsing date '{last_seen}': {e}")
-            return 'unknown'
-    
-    def process_scan_summaries(self):
-        """Process scan summary files"""
-        conn = self.get_db_connection()
-        
-        # Create scans table if it doesn't exist
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS scans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                scan_type TEXT NOT NULL,
-                scan_date TEXT NOT NULL,
-                devices_found INTEGER DEFAULT 0,
-                new_devices INTEGER DEFAULT 0,
-                scan_file TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(scan_type, scan_date)
-            )
-        ''')
-        
-        scan_count = 0
-        for file in os.listdir(SCANNER_DATA_PATH):
-            if re.match(r'^(discovery|fingerprint|vuln)_\d{4}-\d{2}-\d{2}\.md$', file):
-                self.process_scan_summary(conn, os.path.join(SCANNER_DATA_PATH, file))
-                scan_count += 1
-        
-        print(f"{PROJECT_NAME}: Processed {scan_count} scan summary files")
-        conn.close()
-    
+            self.publish_changes(changes)
+
+    def get_device_rows(self, conn, ips):
+        """Fetch the stored parsed-row tuples for the given IPs, keyed by IP"""
+        existing = {}
+        ips = list(ips)
+        # Stay well below SQLite's bound parameter limit
+        for offset in range(0, len(ips), 500):
+            chunk = ips[offset:offset + 500]
+            existing.update((row['ip'], tuple(row)) for row in conn.execute(f'''
+                SELECT {', '.join(DEVICE_ROW_COLUMNS)} FROM devices
+                WHERE ip IN ({', '.join('?' * len(chunk))})
+            ''', chunk))
+        return existing
+
+    def write_device_rows(self, conn, rows, changes=None, service_entries=None):
+        """Upsert parsed device rows that differ from the stored ones, the caller owns the transaction
+
+        service_entries maps IPs to (port, protocol, state, name, version)
+        tuples known from structured input; other rows have theirs parsed
+        from the services text.
+        """
+        if not rows:
+            return
+
+        existing = self.get_device_rows(conn, [row[0] for row in rows])
+        rows = [row for row in rows if existing.get(row[0]) != tuple(row)]
+        if changes is not None:
+            for row in rows:
+                changes['updated' if row[0] in existing else 'added'].add(row[0])
+
+        if rows:
+            # Writes are serialized by the write transaction, so numbering on
+            # from the highest change_seq keeps it increasing in commit order
+            change_seq = conn.execute('SELECT COALESCE(MAX(change_seq), 0) FROM devices').fetchone()[0]
+            # Upsert in place so id, created_at and notes survive updates
+            conn.executemany('''
+                INSERT INTO devices
+                (ip, mac, vendor, hostname, first_seen, last_seen, os_info, services, vulnerabilities,
+                 ip_key, first_seen_at, last_seen_at, change_seq, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(ip) DO UPDATE SET
+                    mac = excluded.mac, vendor = excluded.vendor, hostname = excluded.hostname,
+                    first_seen = excluded.first_seen, last_seen = excluded.last_seen,
+                    first_seen_at = excluded.first_seen_at, last_seen_at = excluded.last_seen_at,
+                    os_info = excluded.os_info, services = excluded.services,
+                    vulnerabilities = excluded.vulnerabilities, change_seq = excluded.change_seq,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', [
+                (*row, ip_sort_key(row[0]), parse_seen(row[FIRST_SEEN_INDEX]), parse_seen(row[LAST_SEEN_INDEX]),
+                 change_seq + index)
+                for index, row in enumerate(rows, 1)
+            ])
+            self.record_device_changes(conn, rows, existing)
+            self.write_device_services(conn, [
+                row for row in rows
+                if row[0] not in existing or existing[row[0]][SERVICES_INDEX] != row[SERVICES_INDEX]
+            ], service_entries)
+
+    def write_device_services(self, conn, rows, service_entries=None):
+        """Replace the services rows of upserted devices whose services text changed"""
+        if not rows:
+            return
+
+        service_entries = service_entries or {}
+
+        device_ids = self.get_device_ids(conn, [row[0] for row in rows])
+        conn.executemany('DELETE FROM services WHERE device_id = ?',
+                         [(device_ids[row[0]],) for row in rows])
+        conn.executemany('''
+            INSERT INTO services (device_id, port, protocol, state, name, version)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (device_ids[row[0]], *entry)
+            for row in rows
+            for entry in (service_entries[row[0]] if row[0] in service_entries
+                          else self.parser.parse_service_entries(row[SERVICES_INDEX]))
+        ])
+
+    def get_device_ids(self, conn, ips):
+        """Map IPs to device ids"""
+        device_ids = {}
+        ips = list(ips)
+        for offset in range(0, len(ips), 500):
+            chunk = ips[offset:offset + 500]
+            device_ids.update((row['ip'], row['id']) for row in conn.execute(f'''
+                SELECT ip, id FROM devices WHERE ip IN ({', '.join('?' * len(chunk))})
+            ''', chunk))
+        return device_ids
+
+    def record_device_changes(self, conn, rows, existing):
+        """Append field-level diffs of upserted device rows to device_changes"""
+        changes = []
+        now = time.time()
+        for row in rows:
+            old = existing.get(row[0])
+            if old is None:
+                changes.append((row[0], 'added', None, None, None))
+                continue
+            changes += [
+                (row[0], 'updated', column, old[index], row[index])
+                for index, column in enumerate(DEVICE_ROW_COLUMNS)
+                if column in HISTORY_FIELDS and old[index] != row[index]
+            ]
+            old_status, new_status = (device_status(parse_seen(values[LAST_SEEN_INDEX]), now) for values in (old, row))
+            if old_status != new_status:
+                changes.append((row[0], 'updated', 'status', old_status, new_status))
+        conn.executemany('''
+            INSERT INTO device_changes (ip, change_type, field, old_value, new_value)
+            VALUES (?, ?, ?, ?, ?)
+        ''', changes)
+
+    def query_changes(self, ip=None, field=None, change_type=None, since=None, until=None,
+                      limit=CHANGE_PAGE_SIZE, cursor=None):
+        """Return (changes, next_cursor) newest first, for one device or the whole network"""
+        if not 1 <= limit <= CHANGE_PAGE_SIZE_MAX:
+            raise ValueError(f"limit must be between 1 and {CHANGE_PAGE_SIZE_MAX}")
+
+        where, params = [], []
+        if ip:
+            where.append('ip = ?')
+            params.append(ip)
+        if field:
+            where.append('field = ?')
+            params.append(field)
+        if change_type:
+            where.append('change_type = ?')
+            params.append(change_type)
+        # changed_at is stored as CURRENT_TIMESTAMP text (UTC, "YYYY-MM-DD HH:MM:SS")
+        if since:
+            where.append('changed_at >= ?')
+            params.append(since.replace('T', ' ').rstrip('Z'))
+        if until:
+            where.append('changed_at < ?')
+            params.append(until.replace('T', ' ').rstrip('Z'))
+        if cursor:
+            changed_at, change_id = self.decode_cursor(cursor, str, int)
+            where.append('(changed_at < ? OR (changed_at = ? AND id < ?))')
+            params += [changed_at, changed_at, change_id]
+
+        # Served in order by idx_device_changes_ip_changed_at or idx_device_changes_changed_at
+        query = 'SELECT id, ip, change_type, field, old_value, new_value, changed_at FROM device_changes'
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += ' ORDER BY changed_at DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        with self.connection(readonly=True) as conn:
+            rows = [dict(row) for row in conn.execute(query, params)]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(rows[-1]['changed_at'], rows[-1]['id'])
+        return rows, next_cursor
+
+    def process_scan_summaries(self, conn, files=None, changes=None, failed=None):
+        """Parse scan summary files and upsert them in one batch, returns rows written"""
+        if files is None:
+            files = os.listdir(SCANNER_DATA_PATH)
+
+        rows = []
+        for file in sorted(files):
+            if SCAN_FILE_PATTERN.match(file):
+                row = self.parse_scan_summary(os.path.join(SCANNER_DATA_PATH, file))
+                if row:
+                    rows.append(row)
+                elif failed is not None:
+                    failed.add(file)
+        self.write_scan_rows(conn, rows)
+        if changes is not None and rows:
+            changes['scans'] = True
+
+        print(f"{PROJECT_NAME}: Processed {len(rows)} scan summary files")
+        return len(rows)
+
     def process_scan_summary(self, conn, filepath):
         """Process individual scan summary file"""
+        row = self.parse_scan_summary(filepath)
+        if row:
+            self.write_scan_rows(conn, [row])
+            conn.commit()
+            changes = new_change_set()
+            changes['scans'] = True
+            self.publish_changes(changes)
+
+    def write_scan_rows(self, conn, rows):
+        """Upsert parsed scan rows, the caller owns the transaction"""
+        if rows:
+            conn.executemany('''
+                INSERT OR REPLACE INTO scans
+                (scan_type, scan_date, devices_found, new_devices, scan_file)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+
+    def add_scan_row(self, conn, row):
+        """Upsert a scans row, adding to the counts of a stored row with the same scan_file"""
+        conn.execute('''
+            INSERT INTO scans (scan_type, scan_date, devices_found, new_devices, scan_file)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(scan_type, scan_date) DO UPDATE SET
+                devices_found = excluded.devices_found
+                    + CASE WHEN scan_file = excluded.scan_file THEN devices_found ELSE 0 END,
+                new_devices = excluded.new_devices
+                    + CASE WHEN scan_file = excluded.scan_file THEN new_devices ELSE 0 END,
+                scan_file = excluded.scan_file
+        ''', row)
+
+    def parse_scan_summary(self, filepath):
+        """Parse a scan summary file into a scans row tuple"""
         try:
             filename = os.path.basename(filepath)
             scan_type = filename.split('_')[0]
@@ -261,55 +1300,745 @@ class NetworkDashboard:
             if '## New Devices' in content:
                 new_devices_section = content.split('## New Devices')[1].split('\n\n')[0]
                 new_devices = len(re.findall(r'- (\d+\.\d+\.\d+\.\d+)', new_devices_section))
-            
-            # Insert scan record
-            conn.execute('''
-                INSERT OR REPLACE INTO scans 
-                (scan_type, scan_date, devices_found, new_devices, scan_file)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (scan_type, scan_date, devices_found, new_devices, filename))
-            
-            conn.commit()
-            
+
+            return (scan_type, scan_date, devices_found, new_devices, filename)
+
         except Exception as e:
             print(f"{PROJECT_NAME}: Error processing scan summary {filepath}: {e}")
+            return None
     
-    def get_dashboard_data(self):
-        """Get all dashboard data"""
-        conn = self.get_db_connection()
-        
+    def ingest_nmap_xml(self, source, scan_type=NMAP_SCAN_TYPE, scan_file=None, accumulate=False):
+        """Stream nmap -oX output into the devices table and return a summary
+
+        source is a file name or binary file object. Hosts are upserted in
+        batches of SYNC_BATCH_SIZE, each batch in its own transaction, so a
+        slow upload never holds the write lock for long. Input that stops
+        being valid XML ends the ingest with 'error' set in the summary; the
+        batches before it stay written.
+        With accumulate, the counts are added to the day's scans row when it
+        has the same scan_file, as for the shards of one orchestrated scan.
+        """
+        if not NMAP_SCAN_TYPE_PATTERN.match(scan_type or ''):
+            raise ValueError(f"Invalid scan type: {scan_type!r}")
+
+        start = time.perf_counter()
+        changes = new_change_set()
+        summary = {'scan_type': scan_type, 'scan_date': None, 'hosts': 0,
+                   'added': 0, 'updated': 0, 'unchanged': 0, 'error': None}
+        hosts = self.nmap_parser.iter_hosts(source)
+        scanned_at = None
+        while summary['error'] is None:
+            batch = []
+            try:
+                for host in hosts:
+                    batch.append(host)
+                    if len(batch) >= SYNC_BATCH_SIZE:
+                        break
+            except ValueError as e:
+                summary['error'] = str(e)
+            if not batch:
+                break
+            with SYNC_DB_WRITE_SECONDS.time():
+                self.write_nmap_hosts(batch, changes)
+            summary['hosts'] += len(batch)
+            scanned_at = min(filter(None, [scanned_at] + [host['scanned_at'] for host in batch]), default=None)
+
+        if summary['hosts']:
+            # Like a scan summary file, one scans row per type and day
+            summary['scan_date'] = datetime.fromtimestamp(scanned_at or time.time()).strftime('%Y-%m-%d')
+            with self.write_lock, self.connection() as conn, conn:
+                row = (scan_type, summary['scan_date'], summary['hosts'], len(changes['added']),
+                       scan_file or 'nmap.xml')
+                if accumulate:
+                    self.add_scan_row(conn, row)
+                else:
+                    self.write_scan_rows(conn, [row])
+                self.record_metrics(conn)
+            changes['scans'] = True
+            self.publish_changes(changes)
+
+        summary['added'] = len(changes['added'])
+        summary['updated'] = len(changes['updated'])
+        summary['unchanged'] = summary['hosts'] - summary['added'] - summary['updated']
+        for result in ('added', 'updated', 'unchanged'):
+            NMAP_INGEST_HOSTS.inc(summary[result], result=result)
+        elapsed = time.perf_counter() - start
+        NMAP_INGEST_SECONDS.observe(elapsed)
+        summary['seconds'] = round(elapsed, 3)
+
+        print(f"{PROJECT_NAME}: Ingested {summary['hosts']} hosts from nmap XML in {elapsed:.2f}s "
+              f"({summary['added']} added, {summary['updated']} updated)"
+              + (f", stopped early: {summary['error']}" if summary['error'] else ''))
+        return summary
+
+    def write_nmap_hosts(self, hosts, changes):
+        """Upsert one batch of parsed nmap hosts in its own transaction"""
+        # A host listed twice in a batch keeps its last entry
+        hosts = {host['ip']: host for host in hosts}
+        with self.write_lock, self.connection() as conn, conn:
+            self.record_status_changes(conn)
+            existing = self.get_device_rows(conn, hosts)
+            rows = [self.nmap_host_row(host, existing.get(ip)) for ip, host in hosts.items()]
+            batch_changes = new_change_set()
+            self.write_device_rows(conn, rows, batch_changes, service_entries={
+                ip: host['service_entries'] for ip, host in hosts.items() if host['service_entries'] is not None
+            })
+        SYNC_ROWS_WRITTEN.inc(len(rows))
+        # A host added by an earlier batch stays added
+        changes['added'] |= batch_changes['added']
+        changes['updated'] |= batch_changes['updated'] - changes['added']
+
+    def nmap_host_row(self, host, existing=None):
+        """Build a devices row tuple from a parsed nmap host
+
+        Whatever the scan did not cover, e.g. the MAC address of a host
+        behind a router or the services of a ping scan, keeps its stored value.
+        """
+        stored = dict(zip(DEVICE_ROW_COLUMNS, existing)) if existing else {}
+
+        def pick(column, value):
+            return value if value else stored.get(column) or ''
+
+        scanned = datetime.fromtimestamp(host['scanned_at'] or time.time())
+        return (host['ip'], pick('mac', host['mac']), pick('vendor', host['vendor']),
+                pick('hostname', host['hostname']), stored.get('first_seen') or scanned.strftime('%Y-%m-%d'),
+                scanned.strftime(NMAP_LAST_SEEN_FORMAT), pick('os_info', host['os_info']),
+                host['services'] if host['services'] is not None else stored.get('services') or '',
+                host['vulnerabilities'] if host['vulnerabilities'] is not None
+                else stored.get('vulnerabilities') or '')
+
+    def get_stats(self, conn, now=None):
+        """Count devices per status as of now
+
+        Each count is a range over idx_devices_last_seen_at_ip: the devices
+        seen after each status bound, differenced into per-status counts.
+        """
+        now = time.time() if now is None else now
+        bounds = status_bounds(now)
+        seen_after = ', '.join(
+            f'(SELECT COUNT(*) FROM devices WHERE last_seen_at > {bound})' for _, bound in bounds)
+        total, unknown, *cumulative = conn.execute(f'''
+            SELECT (SELECT COUNT(*) FROM devices), (SELECT COUNT(*) FROM devices WHERE last_seen_at IS NULL),
+                   {seen_after}
+        ''').fetchone()
+
+        counts = {'unknown': unknown, 'offline': total - unknown - cumulative[-1]}
+        previous = 0
+        for (status, _), count in zip(bounds, cumulative):
+            counts[status] = count - previous
+            previous = count
+
+        stats = {'total_devices': total}
+        for status, key in STATUS_STATS_KEYS.items():
+            stats[key] = counts[status]
+        stats['last_updated'] = datetime.now().isoformat()
+        return stats
+
+    def get_status_expiry(self, conn, now=None):
+        """Epoch time at which the next device moves to an older status, or None"""
+        now = time.time() if now is None else now
+        expiry = None
+        for (_, bound), (_, days) in zip(status_bounds(now), STATUS_WINDOWS):
+            # The oldest device inside a window is the next to leave it
+            seen_at = conn.execute(
+                'SELECT MIN(last_seen_at) FROM devices WHERE last_seen_at > ?', (bound,)).fetchone()[0]
+            if seen_at is not None:
+                crossing = seen_at + days * 86400
+                expiry = crossing if expiry is None else min(expiry, crossing)
+        return expiry
+
+    def get_dashboard_snapshot(self):
+        """Return (data, body, etag) for the dashboard, rebuilt after data changes or a status change"""
+        # Building under the lock keeps concurrent polls from rebuilding it twice
+        with self.snapshot_lock:
+            if self.snapshot is not None and self.is_fresh(self.snapshot[0]['sequence'], self.snapshot_expires):
+                return self.snapshot
+
+            with DASHBOARD_QUERY_SECONDS.time():
+                data = self.get_dashboard_data()
+                expires = data.pop('status_expires', None)
+            with DASHBOARD_SERIALIZE_SECONDS.time():
+                body = json.dumps(data)
+            DASHBOARD_PAYLOAD_BYTES.set(len(body))
+            snapshot = (data, body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+            if 'error' not in data:
+                self.snapshot, self.snapshot_expires = snapshot, expires
+                self.snapshot_cache = {}
+            return snapshot
+
+    def get_dashboard_body(self, fmt='json'):
+        """Return (body, etag) of the dashboard snapshot in one of DASHBOARD_FORMATS, encoded once per snapshot"""
+        data, body, etag = self.get_dashboard_snapshot()
+        if fmt == 'json':
+            return body, etag
+
+        tag = f'{etag}-{fmt}'
+        cache = self.snapshot_cache
+        if tag not in cache:
+            payload = columnar_payload(data)
+            cache[tag] = msgpack.packb(payload) if fmt == 'msgpack' else json.dumps(payload)
+        return cache[tag], tag
+
+    def is_fresh(self, sequence, expires):
+        """Whether a cached payload built at a delta sequence still holds
+
+        Another worker may have published deltas since, which only show up
+        in the shared sequence; device statuses move on at expires.
+        """
+        if expires is not None and time.time() >= expires:
+            return False
+        return sequence == self.worker_state.latest_sequence()
+
+    def publish_changes(self, changes):
+        """Invalidate cached payloads and emit a devices delta for committed changes"""
+        if not (changes['added'] or changes['updated'] or changes['removed'] or changes['scans']):
+            return
+
+        self.invalidate_dashboard_snapshot()
+
+        with self.connection() as conn:
+            devices = {}
+            now = time.time()
+            changed_ips = list(changes['added'] | changes['updated'])
+            reload = len(changed_ips) + len(changes['removed']) > DELTA_MAX_DEVICES
+            if reload:
+                changed_ips = []
+            for offset in range(0, len(changed_ips), 500):
+                chunk = changed_ips[offset:offset + 500]
+                devices.update((row['ip'], dict(row)) for row in conn.execute(f'''
+                    SELECT {device_columns(DEVICE_COLUMNS, now)} FROM devices
+                    WHERE ip IN ({', '.join('?' * len(chunk))})
+                ''', chunk))
+
+            delta = {
+                'added': [devices[ip] for ip in sorted(changes['added']) if ip in devices],
+                'updated': [devices[ip] for ip in sorted(changes['updated']) if ip in devices],
+                'removed': [] if reload else sorted(changes['removed']),
+                'stats': self.get_stats(conn, now),
+            }
+            if reload:
+                delta['reload'] = True
+            if changes['scans']:
+                delta['recent_scans'] = [dict(scan) for scan in conn.execute('''
+                    SELECT * FROM scans ORDER BY scan_date DESC LIMIT 10
+                ''')]
+
+        # Numbered in the shared log, so deltas from every worker form one sequence
+        delta['sequence'] = self.worker_state.publish_delta(delta)
+
+        print(f"{PROJECT_NAME}: Delta {delta['sequence']}: {len(delta['added'])} added, "
+              f"{len(delta['updated'])} updated, {len(delta['removed'])} removed")
+        if self.on_delta:
+            self.on_delta(delta)
+
+    def get_deltas_since(self, sequence):
+        """Return buffered deltas after a sequence number, or None if some are no longer kept"""
+        return self.worker_state.deltas_since(sequence)
+
+    def invalidate_dashboard_snapshot(self):
+        """Drop the cached dashboard and topology payloads after devices or scans changed"""
+        with self.snapshot_lock:
+            self.snapshot = None
+        with self.topology_lock:
+            self.topology = {}
+
+    def query_devices(self, status=None, vendor=None, subnet=None, hostname=None, cidr=None,
+                      sort='last_seen', fields=None, limit=DEVICE_PAGE_SIZE, cursor=None):
+        """Return (devices, next_cursor) for one keyset page
+
+        Ordered by (last_seen_at DESC, ip ASC) with never-seen devices last,
+        or numerically by address with sort='ip'.
+        """
+        if sort not in ('last_seen', 'ip'):
+            raise ValueError("sort must be 'last_seen' or 'ip'")
+        fields = list(fields or DEVICE_LIST_FIELDS)
+        unknown = [field for field in fields if field not in DEVICE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        if not 1 <= limit <= DEVICE_PAGE_SIZE_MAX:
+            raise ValueError(f"limit must be between 1 and {DEVICE_PAGE_SIZE_MAX}")
+
+        now = time.time()
+        where, params = [], []
+        if status:
+            # Ranges over last_seen_at, so the filter is served from the index
+            conditions = [status_condition(name, now) for name in dict.fromkeys(status.split(','))]
+            where.append('(' + ' OR '.join(f'({condition})' for condition, _ in conditions) + ')')
+            params += [param for _, condition_params in conditions for param in condition_params]
+        if vendor:
+            where.append('vendor = ? COLLATE NOCASE')
+            params.append(vendor)
+        if subnet:
+            # Dotted prefix such as "192.168.1" as a range over idx_devices_ip
+            prefix = subnet.rstrip('.') + '.'
+            where.append('ip >= ? AND ip < ?')
+            params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        if hostname:
+            where.append("hostname LIKE ? ESCAPE '\\'")
+            params.append(re.sub(r'([\\%_])', r'\\\1', hostname) + '%')
+        if cidr:
+            # Numeric range over idx_devices_ip_key, e.g. 10.20.0.0/16
+            try:
+                low, high = cidr_key_range(cidr)
+            except ValueError:
+                raise ValueError(f"Invalid cidr: {cidr}")
+            where.append('ip_key BETWEEN ? AND ?')
+            params += [low, high]
+        # Cursor columns are always read, even when not projected
+        select = f"SELECT {device_columns(dict.fromkeys(fields + ['last_seen_at', 'ip', 'ip_key']), now)} FROM devices"
+
+        if sort == 'ip':
+            # Only files named after a valid address are ingested, so ip_key is set
+            where.append('ip_key IS NOT NULL')
+            if cursor:
+                ip_key, ip = self.decode_cursor(cursor, str, str)
+                try:
+                    ip_key = bytes.fromhex(ip_key)
+                except ValueError:
+                    raise ValueError('Invalid cursor')
+                where.append('(ip_key > ? OR (ip_key = ? AND ip > ?))')
+                params += [ip_key, ip_key, ip]
+            phases = [(where, params, 'ip_key, ip')]
+        else:
+            # Dated devices as a range over idx_devices_last_seen_at_ip, then
+            # the never-seen ones by address; the cursor says which phase it is in
+            last_seen_at, ip = self.decode_cursor(cursor, (int, type(None)), str) if cursor else (None, None)
+            dated, dated_params = where + ['last_seen_at IS NOT NULL'], list(params)
+            undated, undated_params = where + ['last_seen_at IS NULL'], list(params)
+            if cursor and last_seen_at is not None:
+                dated.append('(last_seen_at < ? OR (last_seen_at = ? AND ip > ?))')
+                dated_params += [last_seen_at, last_seen_at, ip]
+            elif cursor:
+                undated.append('ip > ?')
+                undated_params.append(ip)
+            phases = [(undated, undated_params, 'ip')]
+            if not cursor or last_seen_at is not None:
+                phases.insert(0, (dated, dated_params, 'last_seen_at DESC, ip ASC'))
+
+        rows = []
+        with self.connection(readonly=True) as conn:
+            for conditions, phase_params, order in phases:
+                query = select + (' WHERE ' + ' AND '.join(conditions) if conditions else '')
+                rows += conn.execute(f'{query} ORDER BY {order} LIMIT ?',
+                                     phase_params + [limit + 1 - len(rows)]).fetchall()
+                if len(rows) > limit:
+                    break
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            if sort == 'ip':
+                next_cursor = self.encode_cursor(rows[-1]['ip_key'].hex(), rows[-1]['ip'])
+            else:
+                next_cursor = self.encode_cursor(rows[-1]['last_seen_at'], rows[-1]['ip'])
+        return [{field: row[field] for field in fields} for row in rows], next_cursor
+
+    def get_subnet_stats(self, prefix=SUBNET_PREFIX, prefix6=SUBNET_PREFIX6, cidr=None):
+        """Device counts by status for every /prefix IPv4 and /prefix6 IPv6 subnet with devices"""
+        if not 0 <= prefix <= 32:
+            raise ValueError('prefix must be between 0 and 32')
+        if not 0 <= prefix6 <= 128:
+            raise ValueError('prefix6 must be between 0 and 128')
         try:
-            # Get devices with error handling
-            devices = conn.execute('''
-                SELECT * FROM devices ORDER BY last_seen DESC, ip ASC
-            ''').fetchall()
-            
-            # Get recent scans with error handling
-            recent_scans = conn.execute('''
-                SELECT * FROM scans ORDER BY scan_date DESC LIMIT 10
+            low, high = cidr_key_range(cidr) if cidr else (None, None)
+        except ValueError:
+            raise ValueError(f"Invalid cidr: {cidr}")
+
+        # Group on the leading whole bytes of ip_key in SQL, finish the bit
+        # masking for non-byte-aligned prefixes in Python
+        families = [(4, 96 + prefix, 'ip_key BETWEEN ? AND ?', list(IPV4_KEY_RANGE)),
+                    (6, prefix6, '(ip_key < ? OR ip_key > ?)', list(IPV4_KEY_RANGE))]
+        subnets = {}
+        status = status_sql(time.time())
+        with self.connection(readonly=True) as conn:
+            for version, bits, condition, params in families:
+                where = [condition, 'ip_key IS NOT NULL']
+                if cidr:
+                    where.append('ip_key BETWEEN ? AND ?')
+                    params += [low, high]
+                rows = conn.execute(f'''
+                    SELECT substr(ip_key, 1, ?) AS network, {status} AS status, COUNT(*) AS count FROM devices
+                    WHERE {' AND '.join(where)}
+                    GROUP BY 1, 2
+                ''', [max(1, (bits + 7) // 8)] + params)
+                for row in rows:
+                    key = int.from_bytes(row['network'].ljust(16, b'\0'), 'big') >> (128 - bits) << (128 - bits)
+                    address = ip_from_sort_key(key.to_bytes(16, 'big'))
+                    network = ipaddress.ip_network((address, bits - 96 if version == 4 else bits))
+                    counts = subnets.setdefault(network, {'total_devices': 0, **dict.fromkeys(STATUS_STATS_KEYS.values(), 0)})
+                    counts['total_devices'] += row['count']
+                    counts[STATUS_STATS_KEYS.get(row['status'], 'unknown_devices')] += row['count']
+
+        return [
+            {'subnet': str(network), 'label': self.get_subnet_label(network), **counts}
+            for network, counts in sorted(subnets.items(), key=lambda item: (item[0].version, item[0]))
+        ]
+
+    def get_subnet_label(self, network):
+        """Label from NMAPPING_SUBNET_LABELS for the narrowest configured network containing a subnet"""
+        matches = [
+            (labelled, label) for labelled, label in SUBNET_LABELS
+            if labelled.version == network.version and network.subnet_of(labelled)
+        ]
+        return max(matches, key=lambda match: match[0].prefixlen)[1] if matches else None
+
+    def query_metrics(self, resolution='hour', since=None, until=None, metrics=None):
+        """Per-bucket averages of the recorded metrics, one list per metric for charting"""
+        if resolution not in METRICS_RESOLUTIONS:
+            raise ValueError(f"resolution must be one of: {', '.join(METRICS_RESOLUTIONS)}")
+        metrics = list(metrics or METRICS_COLUMNS)
+        unknown = [metric for metric in metrics if metric not in METRICS_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+
+        until = parse_epoch(until) if until else int(time.time())
+        since = parse_epoch(since) if since else until - METRICS_DEFAULT_SPAN[resolution]
+        width = METRICS_RESOLUTIONS[resolution]
+        with self.connection(readonly=True) as conn:
+            # Served from the primary key; includes the bucket that since falls into
+            rows = conn.execute(f'''
+                SELECT bucket, samples, {', '.join(metrics)} FROM metrics
+                WHERE resolution = ? AND bucket > ? AND bucket <= ?
+                ORDER BY bucket
+            ''', (resolution, since - width, until)).fetchall()
+
+        return {
+            'resolution': resolution,
+            'since': format_epoch(since),
+            'until': format_epoch(until),
+            'timestamps': [format_epoch(row['bucket']) for row in rows],
+            'samples': [row['samples'] for row in rows],
+            'series': {
+                metric: [round(row[metric] / row['samples'], 2) for row in rows] for metric in metrics
+            },
+        }
+
+    def get_topology(self, group_by='subnet', cluster=None):
+        """Return (body, etag) of the cluster graph, or of one cluster's devices when expanded
+
+        Graphs and node positions are computed once per grouping and kept
+        until the next sync changes devices or a device changes status, so
+        polling clients only revalidate.
+        """
+        if group_by not in TOPOLOGY_GROUPS:
+            raise ValueError(f"group_by must be one of: {', '.join(TOPOLOGY_GROUPS)}")
+
+        with self.topology_lock:
+            topology = self.topology.get(group_by)
+            if topology is None or not self.is_fresh(topology['sequence'], topology['expires']):
+                topology = self.topology[group_by] = self.build_topology(group_by)
+
+            key = cluster or ''
+            if key not in topology['bodies']:
+                if cluster is None:
+                    graph = topology['graph']
+                elif cluster in topology['members']:
+                    graph = self.expand_topology_cluster(topology, cluster)
+                else:
+                    raise LookupError(f"Unknown cluster: {cluster}")
+                body = json.dumps(graph)
+                topology['bodies'][key] = (body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+            return topology['bodies'][key]
+
+    def build_topology(self, group_by):
+        """Group devices into clusters and lay the clusters out around the gateway"""
+        sequence = self.worker_state.latest_sequence()
+        with self.connection(readonly=True) as conn:
+            now = time.time()
+            devices = conn.execute(f'''
+                SELECT ip, ip_key, mac, vendor, hostname, {status_sql(now)} AS status, last_seen FROM devices
+                ORDER BY ip_key, ip
             ''').fetchall()
-            
-            # Calculate statistics
-            total_devices = len(devices)
-            online_devices = len([d for d in devices if d['status'] == 'online'])
-            offline_devices = len([d for d in devices if d['status'] == 'offline'])
-            recently_seen = len([d for d in devices if d['status'] == 'recently_seen'])
-            inactive_devices = len([d for d in devices if d['status'] == 'inactive'])
-            unknown_devices = len([d for d in devices if d['status'] == 'unknown'])
-            
-            stats = {
-                'total_devices': total_devices,
-                'online_devices': online_devices,
-                'offline_devices': offline_devices,
-                'recently_seen': recently_seen,
-                'inactive_devices': inactive_devices,
-                'unknown_devices': unknown_devices,
-                'last_updated': datetime.now().isoformat()
-            }
-            
-            conn.close()
+            expires = self.get_status_expiry(conn, now)
+
+        clusters = {}
+        networks = {}
+        for device in devices:
+            key, label = self.get_topology_group(device, group_by, networks)
+            cluster = clusters.setdefault(f'{group_by}:{key}', {'key': key, 'label': label, 'devices': []})
+            cluster['devices'].append(device)
+
+        # Existing clusters keep their slot, so nothing moves around. Slots of
+        # clusters that disappeared are freed, and new clusters take the
+        # lowest free slots in key order, so the layout stays compact
+        slots = self.topology_slots.setdefault(group_by, {})
+        for cluster_id in set(slots) - set(clusters):
+            del slots[cluster_id]
+        used = set(slots.values())
+        free = (slot for slot in itertools.count() if slot not in used)
+        for cluster_id in sorted(set(clusters) - set(slots)):
+            slots[cluster_id] = next(free)
+
+        # Spread the clusters far enough apart for the largest one to expand
+        largest = max((len(cluster['devices']) for cluster in clusters.values()), default=0)
+        spacing = max(TOPOLOGY_CLUSTER_SPACING,
+                      2.5 * TOPOLOGY_NODE_SPACING * math.sqrt(min(largest, TOPOLOGY_EXPAND_MAX)))
+
+        nodes = [{'id': 'gateway', 'type': 'gateway', 'label': 'Network\nGateway', 'x': 0, 'y': 0}]
+        edges = []
+        for cluster_id, cluster in sorted(clusters.items(), key=lambda item: slots[item[0]]):
+            x, y = spiral_position(slots[cluster_id], spacing, offset=1)
+            cluster['x'], cluster['y'] = x, y
+            statuses = {}
+            for device in cluster['devices']:
+                statuses[device['status']] = statuses.get(device['status'], 0) + 1
+            nodes.append({
+                'id': cluster_id,
+                'type': 'cluster',
+                'key': cluster['key'],
+                'label': cluster['label'],
+                'count': len(cluster['devices']),
+                'statuses': statuses,
+                'x': x,
+                'y': y,
+            })
+            edges.append({'from': 'gateway', 'to': cluster_id})
+
+        graph = {
+            'group_by': group_by,
+            'generated_at': datetime.now().isoformat(),
+            'total_devices': len(devices),
+            'nodes': nodes,
+            'edges': edges,
+        }
+        return {'graph': graph, 'members': clusters, 'bodies': {}, 'sequence': sequence, 'expires': expires}
+
+    def get_topology_group(self, device, group_by, networks):
+        """(key, label) of the cluster a device belongs to; networks caches subnet lookups"""
+        if group_by == 'vendor':
+            vendor = device['vendor'] or 'Unknown'
+            return vendor, vendor
+        if device['ip_key'] is None:
+            return 'unknown', 'Unknown'
+
+        address = ip_from_sort_key(device['ip_key'])
+        bits = 96 + SUBNET_PREFIX if address.version == 4 else SUBNET_PREFIX6
+        prefix = int.from_bytes(device['ip_key'], 'big') >> (128 - bits)
+        if prefix not in networks:
+            network = ipaddress.ip_network((address, bits - 96 if address.version == 4 else bits), strict=False)
+            networks[prefix] = (network, self.get_subnet_label(network))
+        network, label = networks[prefix]
+
+        if group_by == 'vlan' and label:
+            return label, label
+        return str(network), f'{label}\n{network}' if label else str(network)
+
+    def expand_topology_cluster(self, topology, cluster_id):
+        """Device nodes of one cluster, placed on a spiral around the cluster node"""
+        cluster = topology['members'][cluster_id]
+        devices = cluster['devices'][:TOPOLOGY_EXPAND_MAX]
+        nodes = []
+        for index, device in enumerate(devices):
+            x, y = spiral_position(index, TOPOLOGY_NODE_SPACING, offset=1.5)
+            nodes.append({
+                'id': device['ip'],
+                'type': 'device',
+                'label': device['hostname'] or device['ip'],
+                'ip': device['ip'],
+                'mac': device['mac'],
+                'vendor': device['vendor'],
+                'status': device['status'],
+                'last_seen': device['last_seen'],
+                'x': cluster['x'] + x,
+                'y': cluster['y'] + y,
+            })
+        return {
+            'group_by': topology['graph']['group_by'],
+            'cluster': cluster_id,
+            'total_devices': len(cluster['devices']),
+            'truncated': len(cluster['devices']) > len(devices),
+            'nodes': nodes,
+            'edges': [{'from': cluster_id, 'to': node['id']} for node in nodes],
+        }
+
+    def iter_device_export(self, since=None, fields=None):
+        """Yield (columns, watermark), then batches of device rows in write order
+
+        Everything is read in one transaction, so the watermark (the highest
+        change_seq exported) matches the rows; pass it as since= next time to
+        get exactly the rows written after them. since may also be a UTC
+        time, to start from the rows updated at or after it.
+        """
+        fields = list(fields or DEVICE_COLUMNS)
+        unknown = [field for field in fields if field not in DEVICE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        where, params = '', []
+        if since and since.isdigit():
+            where, params = ' WHERE change_seq > ?', [int(since)]
+        elif since:
+            # updated_at is stored as CURRENT_TIMESTAMP text (UTC, "YYYY-MM-DD HH:MM:SS")
+            where, params = ' WHERE updated_at >= ?', [since.replace('T', ' ').rstrip('Z')]
+
+        with self.connection(readonly=True) as conn:
+            conn.execute('BEGIN')
+            watermark = conn.execute(f'SELECT MAX(change_seq) FROM devices{where}', params).fetchone()[0]
+            yield fields, None if watermark is None else str(watermark)
+
+            # Only one batch is held at a time
+            cursor = conn.execute(
+                f"SELECT {device_columns(fields, time.time())} FROM devices{where} ORDER BY change_seq", params)
+            while True:
+                rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                if not rows:
+                    break
+                yield rows
+
+    def search_devices(self, q, limit=SEARCH_PAGE_SIZE, cursor=None):
+        """Return (results, next_cursor) for a full-text query, best matches first"""
+        if not self.search_available:
+            raise RuntimeError('Full-text search is not available')
+        if not 1 <= limit <= SEARCH_PAGE_SIZE_MAX:
+            raise ValueError(f"limit must be between 1 and {SEARCH_PAGE_SIZE_MAX}")
+        match = self.build_match_query(q)
+
+        where, params = '', [match]
+        if cursor:
+            score, device_id = self.decode_cursor(cursor, (int, float), int)
+            where = 'WHERE (score > ? OR (score = ? AND rowid > ?))'
+            params += [score, score, device_id]
+
+        weights = ', '.join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+        with self.connection(readonly=True) as conn:
+            # Rank every match but build snippets for the current page only
+            ranked = conn.execute(f'''
+                SELECT rowid, score FROM (
+                    SELECT rowid, bm25(devices_fts, {weights}) AS score
+                    FROM devices_fts WHERE devices_fts MATCH ?
+                ) {where}
+                ORDER BY score, rowid LIMIT ?
+            ''', params + [limit + 1]).fetchall()
+
+            next_cursor = None
+            if len(ranked) > limit:
+                ranked = ranked[:limit]
+                next_cursor = self.encode_cursor(ranked[-1]['score'], ranked[-1]['rowid'])
+
+            ids = [row['rowid'] for row in ranked]
+            placeholders = ', '.join('?' * len(ids))
+            # Device text comes from scanner output, so it is escaped before the tags go in
+            snippets = {row[0]: mark_snippet(row[1]) for row in conn.execute(f'''
+                SELECT rowid, snippet(devices_fts, -1, ?, ?, '…', {SEARCH_SNIPPET_TOKENS})
+                FROM devices_fts WHERE devices_fts MATCH ? AND rowid IN ({placeholders})
+            ''', [SNIPPET_MARK_START, SNIPPET_MARK_END, match] + ids)}
+            devices = {row['id']: dict(row) for row in conn.execute(f'''
+                SELECT {device_columns(('id', 'ip', 'hostname', 'vendor', 'status', 'last_seen'), time.time())}
+                FROM devices WHERE id IN ({placeholders})
+            ''', ids)}
+
+        results = [
+            {**devices[row['rowid']], 'score': row['score'], 'snippet': snippets.get(row['rowid'], '')}
+            for row in ranked if row['rowid'] in devices
+        ]
+        return results, next_cursor
+
+    def build_match_query(self, q):
+        """Turn free text into an FTS5 query: every word or "quoted phrase" must match, word* matches a prefix"""
+        terms = []
+        for phrase, word in re.findall(r'"([^"]*)"|(\S+)', q or ''):
+            text = phrase or word
+            prefix = not phrase and text.endswith('*')
+            text = text.rstrip('*') if prefix else text
+            # Quoting keeps punctuation such as "7.4" or "CVE-2024-1234" from being read as syntax
+            if text.strip():
+                terms.append('"' + text.replace('"', '""') + '"' + ('*' if prefix else ''))
+        if not terms:
+            raise ValueError('q must contain at least one search term')
+        return ' '.join(terms)
+
+    def query_services(self, port=None, protocol=None, state=None, name=None,
+                       limit=SERVICE_PAGE_SIZE, cursor=None):
+        """Return (services, next_cursor), each with its device's ip, hostname and status"""
+        if not 1 <= limit <= SERVICE_PAGE_SIZE_MAX:
+            raise ValueError(f"limit must be between 1 and {SERVICE_PAGE_SIZE_MAX}")
+
+        where, params = [], []
+        if port is not None:
+            where.append('s.port = ?')
+            params.append(port)
+        if protocol:
+            where.append('s.protocol = ?')
+            params.append(protocol.lower())
+        if state:
+            states = state.lower().split(',')
+            where.append(f"s.state IN ({', '.join('?' * len(states))})")
+            params += states
+        if name:
+            where.append('s.name = ? COLLATE NOCASE')
+            params.append(name)
+        if cursor:
+            where.append('(s.port, s.protocol, s.state, s.device_id) > (?, ?, ?, ?)')
+            params += self.decode_cursor(cursor, int, str, str, int)
+
+        # Ordered like idx_services_port_protocol_state
+        query = f'''
+            SELECT s.port, s.protocol, s.state, s.name, s.version, s.device_id,
+                   {device_columns(('ip', 'hostname', 'status'), time.time(), table='d')}
+            FROM services s JOIN devices d ON d.id = s.device_id
+        '''
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += ' ORDER BY s.port, s.protocol, s.state, s.device_id LIMIT ?'
+        params.append(limit + 1)
+
+        with self.connection(readonly=True) as conn:
+            rows = [dict(row) for row in conn.execute(query, params)]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = self.encode_cursor(last['port'], last['protocol'], last['state'], last['device_id'])
+        return rows, next_cursor
+
+    def encode_cursor(self, *key):
+        """Encode a keyset position as an opaque URL-safe token"""
+        return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, cursor, *types):
+        """Decode a token produced by encode_cursor
+
+        types gives the type, or tuple of types, each key element must have,
+        so that a forged cursor is rejected before it reaches a query.
+        """
+        try:
+            key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        if not isinstance(key, list) or len(key) != len(types):
+            raise ValueError('Invalid cursor')
+        for value, expected in zip(key, types):
+            # JSON true/false would pass as int
+            if isinstance(value, bool) or not isinstance(value, expected):
+                raise ValueError('Invalid cursor')
+        return key
+
+    def get_dashboard_data(self):
+        """Get all dashboard data"""
+        try:
+            with self.connection(readonly=True) as conn:
+                # Deltas up to this sequence are already reflected in the payload
+                sequence = self.worker_state.latest_sequence()
+                now = time.time()
+
+                # Get devices with error handling
+                devices = conn.execute(f'''
+                    SELECT {device_columns(DEVICE_COLUMNS, now)} FROM devices ORDER BY last_seen_at DESC, ip ASC
+                ''').fetchall()
+
+                # Get recent scans with error handling
+                recent_scans = conn.execute('''
+                    SELECT * FROM scans ORDER BY scan_date DESC LIMIT 10
+                ''').fetchall()
+
+                # Calculate statistics
+                stats = self.get_stats(conn, now)
+                status_expires = self.get_status_expiry(conn, now)
             
             return {
+                'sequence': sequence,
+                'status_expires': status_expires,
                 'devices': [dict(device) for device in devices],
                 'recent_scans': [dict(scan) for scan in recent_scans],
                 'stats': stats,
@@ -322,7 +2051,6 @@ class NetworkDashboard:
             
         except Exception as e:
             print(f"{PROJECT_NAME}: Error getting dashboard data: {e}")
-            conn.close()
             return {
                 'devices': [],
                 'recent_scans': [],
@@ -345,6 +2073,7 @@ DASHBOARD_HTML = '''
     <script src="https://cdnjs.cloudflare.com/ajax/libs/socket.io/4.0.1/socket.io.js"></script>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <script src="https://unpkg.com/vis-network/standalone/umd/vis-network.min.js"></script>
+    <script src="https://unpkg.com/@msgpack/msgpack"></script>
     <style>
         :root {
             --primary-color: #667eea;
@@ -470,10 +2199,30 @@ DASHBOARD_HTML = '''
         }
         
         .device-list { 
+            --device-row-height: 136px;
             max-height: 500px; 
             overflow-y: auto;
             scrollbar-width: thin;
         }
+
+        .device-list-window {
+            position: relative;
+        }
+
+        .device-list-window .device-item {
+            position: absolute;
+            left: 0;
+            right: 0;
+            height: calc(var(--device-row-height) - 0.5rem);
+            margin-bottom: 0;
+            overflow: hidden;
+        }
+
+        .device-list-window .device-info p {
+            white-space: nowrap;
+            overflow: hidden;
+            text-overflow: ellipsis;
+        }
         
         .device-item {
             display: flex; 
@@ -519,6 +2268,20 @@ DASHBOARD_HTML = '''
         .status-inactive { background: #e0e7ff; color: #3730a3; }
         .status-unknown { background: #f3f4f6; color: #374151; }
         
+        .topology-controls {
+            display: flex;
+            align-items: center;
+            gap: 0.75rem;
+            margin-bottom: 1rem;
+            font-size: 0.875rem;
+            color: var(--text-light);
+        }
+
+        .history-container {
+            position: relative;
+            height: 300px;
+        }
+
         .topology-container { 
             height: 450px; 
             border: 2px solid var(--border-color); 
@@ -613,6 +2376,7 @@ DASHBOARD_HTML = '''
             .header-content { flex-direction: column; text-align: center; gap: 1rem; }
             .header h1 { font-size: 2rem; }
             .device-item { flex-direction: column; align-items: flex-start; gap: 0.5rem; }
+            .device-list { --device-row-height: 176px; }
         }
     </style>
 </head>
@@ -638,15 +2402,39 @@ DASHBOARD_HTML = '''
                 <div class="stats-grid" id="stats-grid">
                     <div class="loading"><div class="spinner"></div></div>
                 </div>
-                <button class="refresh-btn" onclick="refreshData()">
+                <button class="refresh-btn" onclick="requestSync()">
                     🔄 <span>Refresh Data</span>
                 </button>
                 <div class="last-updated" id="last-updated"></div>
+                <div class="last-updated" id="sync-status"></div>
+            </div>
+
+            <!-- Device History -->
+            <div class="card">
+                <h2>📈 Device History</h2>
+                <div class="topology-controls">
+                    <label for="history-range">Range</label>
+                    <select id="history-range" onchange="updateHistoryChart()">
+                        <option value="raw">Last 24 hours</option>
+                        <option value="hour" selected>Last 7 days</option>
+                        <option value="day">Last year</option>
+                    </select>
+                </div>
+                <div class="history-container"><canvas id="history-chart"></canvas></div>
             </div>
 
             <!-- Network Topology -->
             <div class="card">
                 <h2>🗺️ Network Topology</h2>
+                <div class="topology-controls">
+                    <label for="topology-group">Group by</label>
+                    <select id="topology-group" onchange="setTopologyGroup(this.value)">
+                        <option value="subnet">Subnet</option>
+                        <option value="vlan">VLAN</option>
+                        <option value="vendor">Vendor</option>
+                    </select>
+                    <span>Click a cluster to show or hide its devices</span>
+                </div>
                 <div id="topology" class="topology-container"></div>
             </div>
 
@@ -674,8 +2462,36 @@ DASHBOARD_HTML = '''
 
         // Dashboard data
         let dashboardData = {};
+        let dashboardEtag = null;
         let isConnected = false;
 
+        // With the MessagePack decoder loaded, full payloads are requested as
+        // binary MessagePack with one array per device field
+        const useMsgpack = typeof MessagePack !== 'undefined';
+
+        function decodeDashboard(data) {
+            if (data instanceof ArrayBuffer || ArrayBuffer.isView(data)) {
+                data = MessagePack.decode(data);
+            }
+            if (data.layout !== 'columnar') {
+                return data;
+            }
+            const columns = data.devices;
+            const fields = Object.keys(columns);
+            const count = fields.length ? columns[fields[0]].length : 0;
+            const devices = new Array(count);
+            for (let i = 0; i < count; i++) {
+                const device = {};
+                for (const field of fields) {
+                    device[field] = columns[field][i];
+                }
+                devices[i] = device;
+            }
+            delete data.layout;
+            data.devices = devices;
+            return data;
+        }
+
         // Initialize dashboard
         socket.on('connect', function() {
             console.log('Connected to nMapping+ dashboard');
@@ -692,10 +2508,84 @@ DASHBOARD_HTML = '''
 
         // Listen for data updates
         socket.on('dashboard_update', function(data) {
-            dashboardData = data;
+            dashboardEtag = null;
+            dashboardData = decodeDashboard(data);
+            updateDashboard();
+        });
+
+        // Incremental updates carry a sequence number; on a gap, ask the
+        // server to replay what we missed (or send a full payload)
+        socket.on('devices_delta', function(delta) {
+            const sequence = dashboardData.sequence || 0;
+            if (delta.sequence <= sequence) {
+                return;
+            }
+            if (delta.sequence !== sequence + 1) {
+                socket.emit('request_resync', { since: sequence, format: useMsgpack ? 'msgpack' : 'json' });
+                return;
+            }
+            // Too many devices changed to list them, fetch the new payload
+            if (delta.reload) {
+                dashboardData.sequence = delta.sequence;
+                dashboardEtag = null;
+                refreshData();
+                return;
+            }
+            applyDelta(delta);
             updateDashboard();
         });
 
+        // Sync jobs run in the background; their results arrive as devices_delta
+        socket.on('sync_progress', function(job) {
+            showSyncStatus(job);
+            // Every completed sync adds a metrics sample
+            if (job.state === 'succeeded') {
+                updateHistoryChart();
+            }
+        });
+
+        function requestSync() {
+            fetch('/api/refresh', { method: 'POST' })
+                .then(response => response.json())
+                .then(data => showSyncStatus(data.job))
+                .catch(error => {
+                    console.error('Error requesting sync:', error);
+                });
+        }
+
+        function showSyncStatus(job) {
+            const syncStatus = document.getElementById('sync-status');
+            const progress = job.progress || {};
+            if (job.state === 'running' && progress.total) {
+                syncStatus.textContent = `Sync ${job.stage}: ${progress.processed}/${progress.total} files`;
+            } else if (job.state === 'running') {
+                syncStatus.textContent = `Sync ${job.stage || 'starting'}...`;
+            } else if (job.state === 'failed') {
+                syncStatus.textContent = `Sync failed: ${job.error}`;
+            } else if (job.state === 'succeeded') {
+                syncStatus.textContent = `Sync finished: ${progress.changed || 0} changed, ${progress.deleted || 0} deleted`;
+            } else {
+                syncStatus.textContent = 'Sync queued';
+            }
+        }
+
+        function applyDelta(delta) {
+            const devices = new Map((dashboardData.devices || []).map(device => [device.ip, device]));
+            delta.removed.forEach(ip => devices.delete(ip));
+            delta.added.concat(delta.updated).forEach(device => devices.set(device.ip, device));
+
+            // Same order as the server: last seen (newest first, never seen last), then IP
+            const seenAt = device => device.last_seen_at ?? -Infinity;
+            dashboardData.devices = Array.from(devices.values()).sort((a, b) =>
+                (seenAt(b) - seenAt(a)) || a.ip.localeCompare(b.ip));
+            dashboardData.stats = delta.stats;
+            if (delta.recent_scans) {
+                dashboardData.recent_scans = delta.recent_scans;
+            }
+            dashboardData.sequence = delta.sequence;
+            dashboardEtag = null;
+        }
+
         function updateConnectionStatus() {
             const status = document.getElementById('connection-status');
             if (isConnected) {
@@ -708,10 +2598,24 @@ DASHBOARD_HTML = '''
         }
 
         function refreshData() {
-            fetch('/api/dashboard')
-                .then(response => response.json())
+            // The server falls back to JSON when it cannot send MessagePack
+            const accept = useMsgpack ? 'application/x-msgpack, application/json;q=0.5' : 'application/json';
+            fetch('/api/dashboard', { headers: { Accept: accept } })
+                .then(response => {
+                    // Unchanged payloads are revalidated with a 304 and keep their ETag
+                    const etag = response.headers.get('ETag');
+                    if (etag && etag === dashboardEtag) {
+                        return null;
+                    }
+                    dashboardEtag = etag;
+                    const binary = (response.headers.get('Content-Type') || '').startsWith('application/x-msgpack');
+                    return binary ? response.arrayBuffer() : response.json();
+                })
                 .then(data => {
-                    dashboardData = data;
+                    if (!data) {
+                        return;
+                    }
+                    dashboardData = decodeDashboard(data);
                     updateDashboard();
                 })
                 .catch(error => {
@@ -727,161 +2631,477 @@ DASHBOARD_HTML = '''
             updateLastUpdated();
         }
 
+        // Rendering is incremental: elements are created once, keyed by stat,
+        // device IP or scan id, and only rewritten when their data changed
+
+        const STAT_ITEMS = [
+            ['total_devices', 'Total Devices'],
+            ['online_devices', 'Online'],
+            ['recently_seen', 'Recently Seen'],
+            ['offline_devices', 'Offline'],
+            ['inactive_devices', 'Inactive'],
+            ['unknown_devices', 'Unknown']
+        ];
+        const statNumbers = new Map();
+
         function updateStats() {
             const stats = dashboardData.stats || {};
             const statsGrid = document.getElementById('stats-grid');
-            
-            statsGrid.innerHTML = `
-                <div class="stat-item">
-                    <div class="stat-number">${stats.total_devices || 0}</div>
-                    <div class="stat-label">Total Devices</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">${stats.online_devices || 0}</div>
-                    <div class="stat-label">Online</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">${stats.recently_seen || 0}</div>
-                    <div class="stat-label">Recently Seen</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">${stats.offline_devices || 0}</div>
-                    <div class="stat-label">Offline</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">${stats.inactive_devices || 0}</div>
-                    <div class="stat-label">Inactive</div>
-                </div>
-                <div class="stat-item">
-                    <div class="stat-number">${stats.unknown_devices || 0}</div>
-                    <div class="stat-label">Unknown</div>
-                </div>
-            `;
+
+            if (statNumbers.size === 0) {
+                statsGrid.innerHTML = STAT_ITEMS.map(([key, label]) => `
+                    <div class="stat-item">
+                        <div class="stat-number" data-stat="${key}">0</div>
+                        <div class="stat-label">${label}</div>
+                    </div>
+                `).join('');
+                statsGrid.querySelectorAll('[data-stat]').forEach(number => statNumbers.set(number.dataset.stat, number));
+            }
+            statNumbers.forEach((number, key) => setText(number, stats[key] || 0));
         }
 
+        // Device list: only the rows in view, plus a few either side, exist in
+        // the DOM. They sit at fixed offsets in a spacer as tall as the whole
+        // list, and rows scrolled out of view are reused for the ones scrolled in
+        const DEVICE_LIST_OVERSCAN = 5;
+        const deviceRows = new Map();
+        let deviceListWindow = null;
+        let deviceListFrame = null;
+
         function updateDeviceList() {
             const devices = dashboardData.devices || [];
             const deviceList = document.getElementById('device-list');
             
             if (devices.length === 0) {
+                deviceRows.clear();
+                deviceListWindow = null;
                 deviceList.innerHTML = '<div class="empty-state">No devices found. Run a network scan to discover devices.</div>';
                 return;
             }
-            
-            deviceList.innerHTML = devices.map(device => `
-                <div class="device-item">
-                    <div class="device-info">
-                        <h3>${device.ip} ${device.hostname ? '(' + device.hostname + ')' : ''}</h3>
-                        <p><strong>MAC:</strong> ${device.mac || 'Unknown'} | <strong>Vendor:</strong> ${device.vendor || 'Unknown'}</p>
-                        <p><strong>Last Seen:</strong> ${device.last_seen || 'Unknown'}</p>
-                        ${device.services ? '<p><strong>Services:</strong> ' + device.services.split('\\n').slice(0, 2).join(', ') + '</p>' : ''}
-                    </div>
-                    <span class="status-badge status-${device.status}">${device.status.replace('_', ' ')}</span>
+
+            if (!deviceListWindow) {
+                deviceList.innerHTML = '';
+                deviceListWindow = document.createElement('div');
+                deviceListWindow.className = 'device-list-window';
+                deviceList.appendChild(deviceListWindow);
+            }
+            renderDeviceWindow();
+        }
+
+        function scheduleDeviceWindow() {
+            if (deviceListFrame === null) {
+                deviceListFrame = requestAnimationFrame(() => {
+                    deviceListFrame = null;
+                    renderDeviceWindow();
+                });
+            }
+        }
+
+        function renderDeviceWindow() {
+            if (!deviceListWindow) {
+                return;
+            }
+            const devices = dashboardData.devices || [];
+            const deviceList = document.getElementById('device-list');
+            // Row pitch comes from CSS so that the mobile layout can change it
+            const rowHeight = parseFloat(getComputedStyle(deviceList).getPropertyValue('--device-row-height')) || 136;
+            setStyle(deviceListWindow, 'height', `${devices.length * rowHeight}px`);
+
+            const first = Math.max(0, Math.floor(deviceList.scrollTop / rowHeight) - DEVICE_LIST_OVERSCAN);
+            const last = Math.min(devices.length,
+                Math.ceil((deviceList.scrollTop + deviceList.clientHeight) / rowHeight) + DEVICE_LIST_OVERSCAN);
+            const visible = devices.slice(first, last);
+            const visibleIps = new Set(visible.map(device => device.ip));
+
+            const spare = [];
+            deviceRows.forEach((row, ip) => {
+                if (!visibleIps.has(ip)) {
+                    deviceRows.delete(ip);
+                    spare.push(row);
+                }
+            });
+
+            visible.forEach((device, offset) => {
+                let row = deviceRows.get(device.ip);
+                if (!row) {
+                    row = spare.pop() || deviceListWindow.appendChild(createDeviceRow());
+                    deviceRows.set(device.ip, row);
+                }
+                // Unchanged devices keep their object across deltas and refreshes
+                if (row.device !== device) {
+                    fillDeviceRow(row, device);
+                }
+                setStyle(row, 'top', `${(first + offset) * rowHeight}px`);
+            });
+            spare.forEach(row => row.remove());
+        }
+
+        function createDeviceRow() {
+            const row = document.createElement('div');
+            row.className = 'device-item';
+            row.innerHTML = `
+                <div class="device-info">
+                    <h3></h3>
+                    <p><strong>MAC:</strong> <span></span> | <strong>Vendor:</strong> <span></span></p>
+                    <p><strong>Last Seen:</strong> <span></span></p>
+                    <p><strong>Services:</strong> <span></span></p>
                 </div>
-            `).join('');
+                <span class="status-badge"></span>
+            `;
+            const [mac, vendor, lastSeen, services] = row.querySelectorAll('.device-info span');
+            row.fields = { title: row.querySelector('h3'), mac, vendor, lastSeen, services,
+                           servicesLine: services.parentNode, badge: row.querySelector('.status-badge') };
+            return row;
         }
 
+        function fillDeviceRow(row, device) {
+            const fields = row.fields;
+            row.device = device;
+            setText(fields.title, `${device.ip} ${device.hostname ? '(' + device.hostname + ')' : ''}`);
+            setText(fields.mac, device.mac || 'Unknown');
+            setText(fields.vendor, device.vendor || 'Unknown');
+            setText(fields.lastSeen, device.last_seen || 'Unknown');
+            setText(fields.services, device.services ? device.services.split('\\n').slice(0, 2).join(', ') : '');
+            setStyle(fields.servicesLine, 'display', device.services ? '' : 'none');
+            fields.badge.className = `status-badge status-${device.status}`;
+            setText(fields.badge, device.status.replace('_', ' '));
+        }
+
+        const scanRows = new Map();
+
         function updateScanList() {
             const scans = dashboardData.recent_scans || [];
             const scanList = document.getElementById('scan-list');
             
             if (scans.length === 0) {
+                scanRows.clear();
                 scanList.innerHTML = '<div class="empty-state">No recent scans found.</div>';
                 return;
             }
-            
-            scanList.innerHTML = scans.map(scan => `
-                <div class="scan-item">
-                    <div>
-                        <span class="scan-type">${scan.scan_type}</span>
-                        <strong style="margin-left: 0.5rem;">${scan.scan_date}</strong>
-                    </div>
-                    <div>
-                        <strong>${scan.devices_found}</strong> devices
-                        ${scan.new_devices > 0 ? `<span style="color: var(--success-color); margin-left: 0.5rem;">(+${scan.new_devices} new)</span>` : ''}
-                    </div>
-                </div>
-            `).join('');
+            if (scanRows.size === 0) {
+                scanList.innerHTML = '';
+            }
+
+            const ids = new Set(scans.map(scan => scan.id));
+            scanRows.forEach((row, id) => {
+                if (!ids.has(id)) {
+                    row.remove();
+                    scanRows.delete(id);
+                }
+            });
+
+            scans.forEach((scan, index) => {
+                let row = scanRows.get(scan.id);
+                if (!row) {
+                    row = document.createElement('div');
+                    row.className = 'scan-item';
+                    scanRows.set(scan.id, row);
+                }
+                const signature = JSON.stringify(scan);
+                if (row.signature !== signature) {
+                    row.signature = signature;
+                    row.innerHTML = `
+                        <div>
+                            <span class="scan-type"></span>
+                            <strong style="margin-left: 0.5rem;"></strong>
+                        </div>
+                        <div>
+                            <strong>${scan.devices_found}</strong> devices
+                            ${scan.new_devices > 0 ? `<span style="color: var(--success-color); margin-left: 0.5rem;">(+${scan.new_devices} new)</span>` : ''}
+                        </div>
+                    `;
+                    row.querySelector('.scan-type').textContent = scan.scan_type;
+                    row.querySelector('div strong').textContent = scan.scan_date;
+                }
+                // Newest first: only rows that are out of place are moved
+                if (scanList.children[index] !== row) {
+                    scanList.insertBefore(row, scanList.children[index] || null);
+                }
+            });
+        }
+
+        // DOM writes are skipped when nothing changed, avoiding style recalculation
+        function setText(element, value) {
+            const text = String(value);
+            if (element.textContent !== text) {
+                element.textContent = text;
+            }
+        }
+
+        function setStyle(element, property, value) {
+            if (element.style[property] !== value) {
+                element.style[property] = value;
+            }
+        }
+
+        // Device history: averages per bucket from /api/metrics/timeseries,
+        // drawn into one chart that is updated in place
+        const HISTORY_SERIES = [
+            ['online_devices', 'Online', 'online'],
+            ['recently_seen', 'Recently Seen', 'recently_seen'],
+            ['offline_devices', 'Offline', 'offline'],
+            ['inactive_devices', 'Inactive', 'inactive']
+        ];
+        let historyChart = null;
+
+        function updateHistoryChart() {
+            const resolution = document.getElementById('history-range').value;
+            const metrics = HISTORY_SERIES.map(([metric]) => metric).join(',');
+            fetch(`/api/metrics/timeseries?resolution=${resolution}&metrics=${metrics}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (data.resolution !== document.getElementById('history-range').value) {
+                        return;
+                    }
+                    const labels = data.timestamps.map(timestamp => {
+                        const date = new Date(timestamp);
+                        return data.resolution === 'day' ? date.toLocaleDateString() : date.toLocaleString();
+                    });
+                    if (!historyChart) {
+                        historyChart = new Chart(document.getElementById('history-chart'), {
+                            type: 'line',
+                            data: {
+                                labels: [],
+                                datasets: HISTORY_SERIES.map(([metric, label, status]) => ({
+                                    label: label,
+                                    data: [],
+                                    borderColor: getStatusColor(status),
+                                    backgroundColor: getStatusColor(status),
+                                    pointRadius: 0,
+                                    tension: 0.2
+                                }))
+                            },
+                            options: {
+                                animation: false,
+                                maintainAspectRatio: false,
+                                interaction: { mode: 'index', intersect: false },
+                                scales: { y: { beginAtZero: true } }
+                            }
+                        });
+                    }
+                    historyChart.data.labels = labels;
+                    HISTORY_SERIES.forEach(([metric], index) => {
+                        historyChart.data.datasets[index].data = data.series[metric];
+                    });
+                    historyChart.update();
+                })
+                .catch(error => {
+                    console.error('Error fetching device history:', error);
+                });
         }
 
+        // Topology: cluster nodes at positions computed by the server; a
+        // cluster's devices are fetched when it is clicked. The network is
+        // created once and its DataSets are updated in place, physics stays off
+        let topologyNetwork = null;
+        let topologyNodes = null;
+        let topologyEdges = null;
+        let topologyEtag = null;
+        let topologyGroupBy = 'subnet';
+        // Expanded cluster id -> ETag of its device payload
+        const expandedClusters = new Map();
+
         function updateTopology() {
-            const devices = dashboardData.devices || [];
-            
-            if (devices.length === 0) {
-                document.getElementById('topology').innerHTML = '<div class="empty-state">No devices to display in topology view.</div>';
+            const groupBy = topologyGroupBy;
+            fetch(`/api/topology?group_by=${encodeURIComponent(groupBy)}`)
+                .then(response => {
+                    // Between syncs the graph is revalidated with a 304 and left alone
+                    const etag = response.headers.get('ETag');
+                    if (etag && etag === topologyEtag) {
+                        return null;
+                    }
+                    topologyEtag = etag;
+                    return response.json();
+                })
+                .then(graph => {
+                    if (graph && graph.group_by === topologyGroupBy) {
+                        renderTopology(graph);
+                    }
+                })
+                .catch(error => {
+                    console.error('Error fetching topology:', error);
+                });
+        }
+
+        function setTopologyGroup(groupBy) {
+            topologyGroupBy = groupBy;
+            topologyEtag = null;
+            expandedClusters.clear();
+            if (topologyNodes) {
+                topologyNodes.clear();
+                topologyEdges.clear();
+            }
+            updateTopology();
+        }
+
+        function renderTopology(graph) {
+            const container = document.getElementById('topology');
+            if (graph.total_devices === 0) {
+                if (topologyNetwork) {
+                    topologyNetwork.destroy();
+                    topologyNetwork = null;
+                }
+                container.innerHTML = '<div class="empty-state">No devices to display in topology view.</div>';
                 return;
             }
-            
-            // Create nodes for network visualization
-            const nodes = devices.map(device => ({
-                id: device.ip,
-                label: device.hostname || device.ip,
-                color: getStatusColor(device.status),
-                title: `IP: ${device.ip}\\nMAC: ${device.mac || 'Unknown'}\\nVendor: ${device.vendor || 'Unknown'}\\nStatus: ${device.status}\\nLast Seen: ${device.last_seen || 'Unknown'}`
+
+            const firstRender = !topologyNetwork;
+            if (firstRender) {
+                createTopologyNetwork(container);
+            }
+
+            // Drop clusters that are gone, along with their expanded devices
+            const clusterIds = new Set(graph.nodes.map(node => node.id));
+            topologyNodes.remove(topologyNodes.getIds({
+                filter: node => !clusterIds.has(node.nodeType === 'device' ? node.parentCluster : node.id)
             }));
+            topologyEdges.remove(topologyEdges.getIds({
+                filter: edge => !topologyNodes.get(edge.from) || !topologyNodes.get(edge.to)
+            }));
+            topologyNodes.update(graph.nodes.map(node => topologyNode(node)));
+            topologyEdges.update(graph.edges.map(topologyEdge));
 
-            // Add router/gateway node
-            nodes.unshift({
-                id: 'router',
-                label: 'Network\\nGateway',
-                color: '#667eea',
-                shape: 'diamond',
-                size: 35,
-                font: { color: 'white', size: 14, face: 'arial' }
+            expandedClusters.forEach((etag, clusterId) => {
+                if (clusterIds.has(clusterId)) {
+                    loadCluster(clusterId);
+                } else {
+                    expandedClusters.delete(clusterId);
+                }
             });
+            if (firstRender) {
+                topologyNetwork.fit();
+            }
+        }
 
-            // Create edges (connections to router)
-            const edges = devices.map(device => ({
-                from: 'router',
-                to: device.ip,
-                color: { color: getStatusColor(device.status), opacity: 0.6 },
-                width: 2
-            }));
+        function createTopologyNetwork(container) {
+            container.innerHTML = '';
+            topologyNodes = new vis.DataSet();
+            topologyEdges = new vis.DataSet();
 
-            const data = { 
-                nodes: new vis.DataSet(nodes), 
-                edges: new vis.DataSet(edges) 
-            };
-            
             const options = {
-                layout: { 
-                    randomSeed: 42,
-                    improvedLayout: true
-                },
-                physics: { 
-                    enabled: true, 
-                    stabilization: { iterations: 100 },
-                    barnesHut: { gravitationalConstant: -2000, springConstant: 0.001, springLength: 200 }
-                },
+                physics: { enabled: false },
                 interaction: { 
                     hover: true,
                     tooltipDelay: 200
                 },
                 nodes: {
                     shape: 'dot',
-                    size: 25,
+                    size: 14,
                     font: { size: 12, face: 'arial' },
                     borderWidth: 2,
                     shadow: true
                 },
                 edges: {
-                    smooth: { type: 'continuous' }
+                    smooth: false,
+                    width: 2
                 }
             };
 
-            const container = document.getElementById('topology');
-            const network = new vis.Network(container, data, options);
-            
-            // Add click event for device details
-            network.on('click', function(params) {
-                if (params.nodes.length > 0 && params.nodes[0] !== 'router') {
-                    const deviceIp = params.nodes[0];
+            topologyNetwork = new vis.Network(container, { nodes: topologyNodes, edges: topologyEdges }, options);
+
+            // Clicking a cluster expands or collapses it
+            topologyNetwork.on('click', function(params) {
+                if (params.nodes.length === 0) {
+                    return;
+                }
+                const node = topologyNodes.get(params.nodes[0]);
+                if (node.nodeType === 'cluster') {
+                    if (expandedClusters.has(node.id)) {
+                        collapseCluster(node.id);
+                    } else {
+                        expandedClusters.set(node.id, null);
+                        loadCluster(node.id);
+                    }
+                } else if (node.nodeType === 'device') {
                     // You could open a modal or navigate to device details here
-                    console.log('Device clicked:', deviceIp);
+                    console.log('Device clicked:', node.id);
                 }
             });
         }
 
+        function loadCluster(clusterId) {
+            const groupBy = topologyGroupBy;
+            fetch(`/api/topology?group_by=${encodeURIComponent(groupBy)}&cluster=${encodeURIComponent(clusterId)}`)
+                .then(response => {
+                    if (!response.ok) {
+                        collapseCluster(clusterId);
+                        return null;
+                    }
+                    const etag = response.headers.get('ETag');
+                    if (etag && etag === expandedClusters.get(clusterId)) {
+                        return null;
+                    }
+                    expandedClusters.set(clusterId, etag);
+                    return response.json();
+                })
+                .then(data => {
+                    // Skip answers for clusters collapsed or regrouped in the meantime
+                    if (!data || groupBy !== topologyGroupBy || !expandedClusters.has(clusterId)) {
+                        return;
+                    }
+                    const deviceIds = new Set(data.nodes.map(node => node.id));
+                    topologyNodes.remove(topologyNodes.getIds({
+                        filter: node => node.parentCluster === clusterId && !deviceIds.has(node.id)
+                    }));
+                    topologyEdges.remove(topologyEdges.getIds({
+                        filter: edge => edge.from === clusterId && !deviceIds.has(edge.to)
+                    }));
+                    topologyNodes.update(data.nodes.map(node => topologyNode(node, clusterId)));
+                    topologyEdges.update(data.edges.map(topologyEdge));
+                })
+                .catch(error => {
+                    console.error('Error expanding cluster:', error);
+                });
+        }
+
+        function collapseCluster(clusterId) {
+            expandedClusters.delete(clusterId);
+            if (!topologyNodes) {
+                return;
+            }
+            topologyEdges.remove(topologyEdges.getIds({ filter: edge => edge.from === clusterId }));
+            topologyNodes.remove(topologyNodes.getIds({ filter: node => node.parentCluster === clusterId }));
+        }
+
+        function topologyNode(node, clusterId) {
+            const base = { id: node.id, nodeType: node.type, x: node.x, y: node.y };
+            if (node.type === 'gateway') {
+                return Object.assign(base, {
+                    label: node.label,
+                    color: '#667eea',
+                    shape: 'diamond',
+                    size: 35,
+                    font: { color: 'white', size: 14, face: 'arial' }
+                });
+            }
+            if (node.type === 'cluster') {
+                // Coloured by the most common status among its devices
+                const statuses = Object.entries(node.statuses).sort((a, b) => b[1] - a[1]);
+                return Object.assign(base, {
+                    label: `${node.label}\\n${node.count} device${node.count === 1 ? '' : 's'}`,
+                    color: getStatusColor(statuses.length ? statuses[0][0] : 'unknown'),
+                    size: 20 + 4 * Math.log2(node.count),
+                    title: statuses.map(([status, count]) => `${status}: ${count}`).join('\\n'),
+                    borderWidth: 4
+                });
+            }
+            return Object.assign(base, {
+                parentCluster: clusterId,
+                label: node.label,
+                color: getStatusColor(node.status),
+                title: `IP: ${node.ip}\\nMAC: ${node.mac || 'Unknown'}\\nVendor: ${node.vendor || 'Unknown'}\\nStatus: ${node.status}\\nLast Seen: ${node.last_seen || 'Unknown'}`
+            });
+        }
+
+        function topologyEdge(edge) {
+            return {
+                id: `${edge.from}>${edge.to}`,
+                from: edge.from,
+                to: edge.to,
+                color: { color: '#cbd5e1', opacity: 0.6 }
+            };
+        }
+
         function updateLastUpdated() {
             const lastUpdated = document.getElementById('last-updated');
             const now = new Date();
@@ -898,39 +3118,416 @@ DASHBOARD_HTML = '''
             }
         }
 
+        document.getElementById('device-list').addEventListener('scroll', scheduleDeviceWindow, { passive: true });
+        window.addEventListener('resize', scheduleDeviceWindow);
+
         // Auto-refresh every 30 seconds
         setInterval(refreshData, 30000);
 
         // Initial load
         document.addEventListener('DOMContentLoaded', function() {
             refreshData();
+            updateHistoryChart();
         });
     </script>
 </body>
 </html>
 '''
 
+def count_emit(event, payload, clients, body=None):
+    """Record an emitted event with its fan-out and JSON payload size"""
+    SOCKETIO_EMITS.inc(event=event)
+    SOCKETIO_MESSAGES.inc(clients, event=event)
+    if clients:
+        SOCKETIO_BYTES.inc(len(body if body is not None else json.dumps(payload)) * clients, event=event)
+
+def broadcast_delta(delta):
+    """Push a devices delta to every connected client"""
+    count_emit('devices_delta', delta, SOCKETIO_CLIENTS.get())
+    socketio.emit('devices_delta', delta)
+
+dashboard.on_delta = broadcast_delta
+
+def broadcast_sync_progress(job):
+    """Push sync job state changes to every connected client"""
+    count_emit('sync_progress', job, SOCKETIO_CLIENTS.get())
+    socketio.emit('sync_progress', job)
+    # Other workers answer /api/sync/<id> from the shared record; stage reports
+    # are left out, they arrive while the sync holds the database write lock
+    if job['state'] != 'running' or job['stage'] is None:
+        dashboard.worker_state.save_sync_job(job)
+
+# One worker thread runs every sync, scheduled or requested
+scheduler = SyncScheduler(dashboard.sync_from_scanner_data, interval=SYNC_INTERVAL, jitter=SYNC_JITTER,
+                          max_backoff=SYNC_MAX_BACKOFF, history=SYNC_JOB_HISTORY,
+                          on_progress=broadcast_sync_progress)
+
+# Watch mode feeds touched vault files to the same scheduler, so they never
+# race a full sync
+watcher = FileWatcher(SCANNER_DATA_PATH,
+                      on_batch=lambda files: scheduler.request('watch', files=files),
+                      file_filter=dashboard.is_scanner_file,
+                      on_overflow=lambda: scheduler.request('watch'),
+                      backend=WATCH_BACKEND, debounce=WATCH_DEBOUNCE, max_delay=WATCH_MAX_DELAY,
+                      poll_interval=WATCH_POLL_INTERVAL)
+# The full sync after a pull already ingests what it changed
+dashboard.suppress_watch = watcher.suppress
+
+def queue_sync(reason):
+    """Queue a sync on this process's scheduler and share the job with the other workers"""
+    job = scheduler.request(reason)
+    dashboard.worker_state.save_sync_job(job)
+    return job
+
+def request_sync(reason):
+    """Start a sync on the leader, wherever it runs, and return its job
+
+    Other workers leave the request for the leader and return a queued job
+    right away; its id follows the leader's job on /api/sync/<id>. Without
+    background syncs no scheduler thread runs, so the sync runs here and the
+    job comes back finished.
+    """
+    if not BACKGROUND_SYNC:
+        return scheduler.run_now(reason)
+    if leader.is_leader:
+        return queue_sync(reason)
+    job = new_job_record(reason)
+    dashboard.worker_state.add_sync_request(job)
+    return job
+
+def serve_sync_requests():
+    """Leader loop: queue the syncs requested on other workers"""
+    while True:
+        try:
+            dashboard.worker_state.take_sync_requests(queue_sync)
+        except Exception as e:
+            print(f"{PROJECT_NAME}: Taking sync requests failed: {e}")
+        time.sleep(SYNC_REQUEST_POLL_INTERVAL)
+
+def start_background_sync():
+    """Run syncs, watch mode and forwarded sync requests in the elected process"""
+    SYNC_LEADER.set(1)
+    scheduler.start()
+    if WATCH_ENABLED:
+        print(f"{PROJECT_NAME}: Watching {SCANNER_DATA_PATH} for scanner file changes")
+        watcher.start()
+    threading.Thread(target=serve_sync_requests, name='sync-requests', daemon=True).start()
+
+# With several workers, only the one holding the lock file runs syncs; the
+# others take over within LEADER_RETRY_INTERVAL seconds if it exits
+leader = LeaderElection(LEADER_LOCK_PATH, on_elected=start_background_sync, retry_interval=LEADER_RETRY_INTERVAL)
+
+@socketio.on('connect')
+def handle_connect(auth=None):
+    SOCKETIO_CLIENTS.inc()
+
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    SOCKETIO_CLIENTS.dec()
+
+@socketio.on('refresh_request')
+def handle_refresh_request(data=None):
+    """Queue a sync on behalf of a client, e.g. sync_dashboard.sh after a pull"""
+    job = request_sync('socket')
+    count_emit('sync_progress', job, 1)
+    emit('sync_progress', job)
+
+@socketio.on('request_resync')
+def handle_request_resync(data=None):
+    """Replay missed deltas to a client that fell behind, or send it a full payload
+
+    A client that sends format: 'msgpack' gets the full payload as binary
+    MessagePack with columnar devices, when the server has msgpack.
+    """
+    since = (data or {}).get('since')
+    deltas = dashboard.get_deltas_since(since) if isinstance(since, int) else None
+    if deltas is None:
+        if (data or {}).get('format') == 'msgpack' and msgpack is not None:
+            body, etag = dashboard.get_dashboard_body('msgpack')
+            count_emit('dashboard_update', None, 1, body=body)
+            emit('dashboard_update', body)
+            return
+        payload, body, etag = dashboard.get_dashboard_snapshot()
+        count_emit('dashboard_update', payload, 1, body=body)
+        emit('dashboard_update', payload)
+        return
+
+    for delta in deltas:
+        count_emit('devices_delta', delta, 1)
+        emit('devices_delta', delta)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request_latency(response):
+    """Record request latency by route pattern, which keeps label values bounded"""
+    start = g.get('request_start')
+    if start is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                     endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+                                     status=response.status_code)
+    return response
+
+def collect_runtime_metrics():
+    """Copy pool, scheduler and device counts into their metrics at scrape time"""
+    for pool, stats in dashboard.get_pool_stats().items():
+        for state in ('open', 'idle', 'in_use', 'waiting'):
+            DB_POOL_CONNECTIONS.set(stats[state], pool=pool, state=state)
+        for event in ('acquired', 'reused', 'waited', 'timeouts', 'discarded'):
+            DB_POOL_EVENTS.set(stats[event], pool=pool, event=event)
+    SYNC_CONSECUTIVE_FAILURES.set(scheduler.status()['consecutive_failures'])
+    with dashboard.connection(readonly=True) as conn:
+        stats = dashboard.get_stats(conn)
+    for status, key in STATUS_STATS_KEYS.items():
+        DEVICES.set(stats[key], status=status)
+
+registry.add_collector(collect_runtime_metrics)
+
 @app.route('/')
-def dashboard():
+def index():
     """Main dashboard page"""
     return render_template_string(DASHBOARD_HTML)
 
+def negotiate_encoding():
+    """Best Content-Encoding the client accepts: br, gzip, or None"""
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def conditional_response(body, etag, mimetype='application/json', cache=None):
+    """Response that answers If-None-Match revalidation with 304, compressed when the client accepts it
+
+    Each encoding gets its own ETag. Compressed bodies are kept in cache,
+    keyed by that ETag, when one is given.
+    """
+    encoding = negotiate_encoding() if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        etag = f'{etag}-{encoding}'
+    headers = {
+        # Let browsers keep the payload but revalidate it on every poll
+        'Cache-Control': 'no-cache',
+        'Vary': 'Accept, Accept-Encoding',
+    }
+    if request.if_none_match.contains_weak(etag):
+        # Revalidation never pays for compression
+        response = app.response_class(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    if encoding:
+        headers['Content-Encoding'] = encoding
+        compressed = cache.get(etag) if cache is not None else None
+        if compressed is None:
+            compressed = compress_body(body, encoding)
+            if cache is not None:
+                cache[etag] = compressed
+        body = compressed
+    response = app.response_class(body, mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    return response
+
+def dashboard_format():
+    """Payload format a request asks for, with ?format= or an Accept header"""
+    fmt = request.args.get('format')
+    if fmt is None:
+        offered = ['application/json'] + ([MSGPACK_MIMETYPE] if msgpack is not None else [])
+        return 'msgpack' if request.accept_mimetypes.best_match(offered) == MSGPACK_MIMETYPE else 'json'
+    if fmt not in DASHBOARD_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(DASHBOARD_FORMATS)}")
+    if fmt == 'msgpack' and msgpack is None:
+        raise LookupError('msgpack is not installed on the server')
+    return fmt
+
+def ndjson_chunks(batches, columns):
+    """Encode row batches as newline-delimited JSON objects"""
+    for rows in batches:
+        yield ''.join(json.dumps(dict(zip(columns, row))) + '\n' for row in rows).encode('utf-8')
+
+def csv_chunks(batches, columns):
+    """Encode row batches as CSV, starting with a header row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    """Compress a stream of chunks into one gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
 @app.route('/api/dashboard')
 def api_dashboard():
     """API endpoint for dashboard data"""
-    data = dashboard.get_dashboard_data()
-    return jsonify(data)
+    try:
+        fmt = dashboard_format()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 406
+
+    body, etag = dashboard.get_dashboard_body(fmt)
+    return conditional_response(body, etag, mimetype=MSGPACK_MIMETYPE if fmt == 'msgpack' else 'application/json',
+                                cache=dashboard.snapshot_cache)
 
 @app.route('/api/refresh', methods=['POST', 'GET'])
 def api_refresh():
     """API endpoint to refresh data from scanner"""
-    success = dashboard.sync_from_scanner_data()
-    data = dashboard.get_dashboard_data()
-    
-    # Emit update to all connected clients
-    socketio.emit('dashboard_update', data)
-    
-    return jsonify({'success': success, 'message': f'{PROJECT_NAME} data refreshed successfully'})
+    # Returns at once, unless background syncs are off and the sync runs
+    # here; progress is reported on /api/sync/<id> and as sync_progress
+    # events, and clients receive the resulting devices_delta
+    job = request_sync('api')
+    if job['state'] in ('succeeded', 'failed'):
+        return jsonify({'success': job['state'] == 'succeeded', 'job_id': job['id'], 'job': job,
+                        'message': f"{PROJECT_NAME} data refresh {job['state']}"}), \
+            200 if job['state'] == 'succeeded' else 500
+
+    return jsonify({'success': True, 'job_id': job['id'], 'job': job,
+                    'message': f'{PROJECT_NAME} data refresh queued'}), 202
+
+@app.route('/api/ingest/nmap', methods=['POST'])
+def api_ingest_nmap():
+    """Ingest nmap -oX output, sent as the request body or a multipart "file" field"""
+    # The body is parsed as it arrives; multipart uploads are spooled to a
+    # temporary file by Werkzeug first
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': 'Missing "file" field'}), 400
+        source, scan_file = upload.stream, upload.filename
+    else:
+        source, scan_file = request.stream, None
+
+    try:
+        summary = dashboard.ingest_nmap_xml(
+            source,
+            scan_type=request.args.get('scan_type', NMAP_SCAN_TYPE),
+            scan_file=request.args.get('scan_file', scan_file),
+            accumulate=request.args.get('accumulate', '0').lower() in ('1', 'true', 'yes'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(summary), 400 if summary['error'] else 200
+
+@app.route('/api/sync/<job_id>')
+def api_sync_job(job_id):
+    """API endpoint for the state of a sync job"""
+    job = scheduler.get_job(job_id) or dashboard.worker_state.get_sync_job(job_id)
+    if job:
+        return jsonify(job)
+    else:
+        return jsonify({'error': 'Sync job not found'}), 404
+
+@app.route('/api/devices')
+def api_devices():
+    """API endpoint for a filtered, keyset-paginated device list"""
+    fields = request.args.get('fields')
+    try:
+        devices, next_cursor = dashboard.query_devices(
+            status=request.args.get('status'),
+            vendor=request.args.get('vendor'),
+            subnet=request.args.get('subnet'),
+            hostname=request.args.get('hostname'),
+            cidr=request.args.get('cidr'),
+            sort=request.args.get('sort', 'last_seen'),
+            fields=fields.split(',') if fields else None,
+            limit=request.args.get('limit', DEVICE_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'devices': devices, 'next_cursor': next_cursor})
+
+@app.route('/api/export/devices.<fmt>')
+def api_export_devices(fmt):
+    """Stream the device inventory as NDJSON or CSV"""
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'error': f"Unsupported export format: {fmt}"}), 404
+
+    fields = request.args.get('fields')
+    export = dashboard.iter_device_export(since=request.args.get('since'),
+                                          fields=fields.split(',') if fields else None)
+    try:
+        # Runs up to the first yield: validates arguments and opens the read transaction
+        columns, watermark = next(export)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    chunks = (ndjson_chunks if fmt == 'ndjson' else csv_chunks)(export, columns)
+    headers = {
+        'Content-Disposition': f'attachment; filename=devices.{fmt}',
+        'Vary': 'Accept-Encoding',
+    }
+    if watermark:
+        headers['X-Export-Watermark'] = watermark
+    if request.accept_encodings['gzip']:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return app.response_class(chunks, mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
+
+@app.route('/api/subnets')
+def api_subnets():
+    """API endpoint for per-subnet device counts by status"""
+    try:
+        subnets = dashboard.get_subnet_stats(
+            prefix=request.args.get('prefix', SUBNET_PREFIX, type=int),
+            prefix6=request.args.get('prefix6', SUBNET_PREFIX6, type=int),
+            cidr=request.args.get('cidr'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'subnets': subnets})
+
+@app.route('/api/topology')
+def api_topology():
+    """API endpoint for the clustered network graph, or one expanded cluster"""
+    try:
+        body, etag = dashboard.get_topology(group_by=request.args.get('group_by', 'subnet'),
+                                            cluster=request.args.get('cluster'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+
+    return conditional_response(body, etag)
+
+@app.route('/api/metrics/timeseries')
+def api_metrics_timeseries():
+    """API endpoint for device counts over time, pre-aggregated per bucket"""
+    metrics = request.args.get('metrics')
+    try:
+        timeseries = dashboard.query_metrics(
+            resolution=request.args.get('resolution', 'hour'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            metrics=metrics.split(',') if metrics else None,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(timeseries)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return app.response_class(registry.render(), content_type=METRICS_CONTENT_TYPE)
 
 @app.route('/api/health')
 def api_health():
@@ -939,52 +3536,99 @@ def api_health():
         'status': 'healthy',
         'project': PROJECT_NAME,
         'version': PROJECT_VERSION,
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'database_pools': dashboard.get_pool_stats(),
+        'sync': scheduler.status(),
+        'leader': leader.status()
     })
 
 @app.route('/api/device/<ip>')
 def api_device(ip):
     """API endpoint for individual device details"""
-    conn = dashboard.get_db_connection()
-    device = conn.execute('SELECT * FROM devices WHERE ip = ?', (ip,)).fetchone()
-    conn.close()
+    with dashboard.connection(readonly=True) as conn:
+        device = conn.execute(f'SELECT {device_columns(DEVICE_COLUMNS, time.time())} FROM devices WHERE ip = ?',
+                              (ip,)).fetchone()
     
     if device:
         return jsonify(dict(device))
     else:
         return jsonify({'error': 'Device not found'}), 404
 
+@app.route('/api/device/<ip>/history')
+def api_device_history(ip):
+    """API endpoint for the change history of one device"""
+    return changes_response(ip=ip)
+
+@app.route('/api/changes')
+def api_changes():
+    """API endpoint for recent device changes across the network"""
+    return changes_response(field=request.args.get('field'), change_type=request.args.get('type'))
+
+def changes_response(**filters):
+    """Run a change history query from the request arguments"""
+    try:
+        changes, next_cursor = dashboard.query_changes(
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            limit=request.args.get('limit', CHANGE_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor'),
+            **filters,
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'changes': changes, 'next_cursor': next_cursor})
+
+@app.route('/api/services')
+def api_services():
+    """API endpoint for the hosts exposing a given port, protocol or service state"""
+    port = request.args.get('port')
+    if port is not None and not port.isdigit():
+        return jsonify({'error': 'port must be a number'}), 400
+    try:
+        services, next_cursor = dashboard.query_services(
+            port=int(port) if port is not None else None,
+            protocol=request.args.get('protocol'),
+            state=request.args.get('state'),
+            name=request.args.get('name'),
+            limit=request.args.get('limit', SERVICE_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'services': services, 'next_cursor': next_cursor})
+
+@app.route('/api/search')
+def api_search():
+    """API endpoint for ranked full-text search over device details"""
+    try:
+        results, next_cursor = dashboard.search_devices(
+            request.args.get('q', ''),
+            limit=request.args.get('limit', SEARCH_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor'),
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+
+    return jsonify({'results': results, 'next_cursor': next_cursor})
+
 @app.route('/api/stats')
 def api_stats():
     """API endpoint for dashboard statistics"""
-    data = dashboard.get_dashboard_data()
-    return jsonify(data['stats'])
-
-def background_sync():
-    """Background task to sync data periodically"""
-    print(f"{PROJECT_NAME}: Starting background sync service")
-    
-    while True:
-        try:
-            success = dashboard.sync_from_scanner_data()
-            if success:
-                data = dashboard.get_dashboard_data()
-                socketio.emit('dashboard_update', data)
-                print(f"{PROJECT_NAME}: Background sync completed and clients updated")
-            else:
-                print(f"{PROJECT_NAME}: Background sync failed")
-        except Exception as e:
-            print(f"{PROJECT_NAME}: Background sync error: {e}")
-        
-        # Sync every 5 minutes
-        time.sleep(300)
+    data, body, etag = dashboard.get_dashboard_snapshot()
+    return conditional_response(json.dumps(data['stats']), f'{etag}-stats')
 
-# Start background sync thread
+# Start the sync scheduler, in this process or whichever worker leads
 print(f"{PROJECT_NAME} v{PROJECT_VERSION}: Initializing dashboard...")
-sync_thread = threading.Thread(target=background_sync, daemon=True)
-sync_thread.start()
+if BACKGROUND_SYNC:
+    # Before leader.start(), the first thread this module starts
+    dashboard.start_parse_pool()
+    leader.start()
 
 if __name__ == '__main__':
-    print(f"{PROJECT_NAME} v{PROJECT_VERSION}: Starting web dashboard on port 5000")
-    print(f"Dashboard will be available at: http://localhost:5000")
-    socketio.run(app, host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    print(f"{PROJECT_NAME} v{PROJECT_VERSION}: Starting web dashboard on port {PORT}")
+    print(f"Dashboard will be available at: http://localhost:{PORT}")
+    socketio.run(app, host='0.0.0.0', port=PORT, debug=False)
\ No newline at end of file
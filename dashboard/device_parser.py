@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Device Parser
+Single-pass parser for the device markdown files written by the scanner.
+"""
+
+import re
+import time
+from bisect import bisect_left
+
+import frontmatter
+
+
+class DeviceMarkdownParser:
+    """Tokenize a device file once into **Key:** fields, sections and service lines"""
+
+    # Field name (as written in the file) -> parsed key
+    FIELDS = {
+        'mac': 'mac',
+        'vendor': 'vendor',
+        'hostname': 'hostname',
+        'first seen': 'first_seen',
+        'last seen': 'last_seen',
+    }
+
+    # Section heading -> parsed key
+    SECTIONS = {
+        '## os & services': 'os_info',
+        '## vulnerabilities': 'vulnerabilities',
+    }
+
+    # Zero-width so overlapping markers such as "**MAC:**Vendor:**" are all seen
+    FIELD_PATTERN = re.compile(r'(?=\*\*(MAC|Vendor|Hostname|First Seen|Last Seen):\*\*)', re.IGNORECASE)
+    # \s* may run over line breaks, like the original per-field regexes
+    VALUE_PATTERN = re.compile(r'\s*(.+)')
+    BOLD_PATTERN = re.compile(r'^\*\*|\*\*$')
+    HEADING_PATTERN = re.compile(r'## (?:OS & Services|Vulnerabilities)', re.IGNORECASE)
+    # Any "## " ends a section, including the tail of "### " sub-headings
+    SECTION_BREAK_PATTERN = re.compile(r'## ')
+    SERVICE_PATTERN = re.compile(r'\d+/(?:tcp|udp)[^\S\n]+(?:open|filtered|closed)|Port[^\S\n]+\d+', re.IGNORECASE)
+    # nmap "PORT STATE SERVICE VERSION" row, e.g. "22/tcp open ssh OpenSSH 7.4"
+    SERVICE_ENTRY_PATTERN = re.compile(
+        r'(\d+)/(tcp|udp)\s+(open\|filtered|open|filtered|closed)(?:\s+(\S+))?(?:\s+(.+))?', re.IGNORECASE)
+    PORT_ENTRY_PATTERN = re.compile(r'Port\s+(\d+)', re.IGNORECASE)
+
+    def parse(self, text):
+        """Parse a device file, stripping YAML frontmatter if present"""
+        try:
+            text = frontmatter.loads(text).content
+        except Exception:
+            pass
+        return self.parse_content(text)
+
+    def parse_content(self, content):
+        """Parse markdown content into a dict of device fields"""
+        device = {key: "" for key in self.FIELDS.values()}
+        device.update({key: "" for key in self.SECTIONS.values()})
+        device.update(self.parse_fields(content))
+        device.update(self.parse_sections(content))
+        device['services'] = self.parse_services(content)
+        return device
+
+    def parse_fields(self, content):
+        """Extract the first usable value of each **Key:** field"""
+        fields = {}
+        for match in self.FIELD_PATTERN.finditer(content):
+            key = self.FIELDS.get(match.group(1).casefold())
+            if key is None or key in fields:
+                continue
+            value = self.VALUE_PATTERN.match(content, match.end(1) + len(':**'))
+            if value is None:
+                # Nothing but line breaks follow, try the next occurrence
+                continue
+            value = self.BOLD_PATTERN.sub('', value.group(1).strip())
+            fields[key] = value if value and value != 'Unknown' else ""
+            if len(fields) == len(self.FIELDS):
+                break
+        return fields
+
+    def parse_sections(self, content):
+        """Extract each known section from its heading up to the next "## " """
+        breaks = [match.start() for match in self.SECTION_BREAK_PATTERN.finditer(content)]
+        # A section may also run to the end of the content, ignoring one final newline
+        content_end = len(content) - 1 if content.endswith('\n') else len(content)
+
+        sections = {}
+        for match in self.HEADING_PATTERN.finditer(content):
+            key = self.SECTIONS.get(match.group(0).casefold())
+            if key is None or key in sections:
+                continue
+            index = bisect_left(breaks, match.end())
+            end = min(breaks[index], content_end) if index < len(breaks) else content_end
+            sections[key] = content[match.start():end].strip()
+            if len(sections) == len(self.SECTIONS):
+                break
+        return sections
+
+    def parse_services(self, content):
+        """Extract every line that mentions a port, newline separated"""
+        services = []
+        position = 0
+        while True:
+            match = self.SERVICE_PATTERN.search(content, position)
+            if match is None:
+                break
+            line_start = content.rfind('\n', 0, match.start()) + 1
+            line_end = content.find('\n', match.end())
+            if line_end == -1:
+                line_end = len(content)
+            services.append(content[line_start:line_end].strip())
+            position = line_end + 1
+        return '\n'.join(services)
+
+    def parse_service_entries(self, services):
+        """Split the services text into (port, protocol, state, name, version) tuples, one per port"""
+        entries = {}
+        for line in services.split('\n'):
+            match = self.SERVICE_ENTRY_PATTERN.search(line)
+            if match:
+                port, protocol, state, name, version = match.groups()
+                entry = (int(port), protocol.lower(), state.lower(), name or '', (version or '').strip())
+            else:
+                match = self.PORT_ENTRY_PATTERN.search(line)
+                if not match:
+                    continue
+                # Free-form "Port 22" mentions carry no protocol or state, assume an open TCP port
+                entry = (int(match.group(1)), 'tcp', 'open', '', '')
+            # A port listed twice keeps its first entry
+            entries.setdefault(entry[:2], entry)
+        return list(entries.values())
+
+
+PARSER = DeviceMarkdownParser()
+
+
+def parse_device_file(ip, filepath):
+    """Parse a device markdown file into a devices row tuple, or None if it cannot be read
+
+    A plain function of the file alone, so that parsing pool workers need
+    nothing from the dashboard process.
+    """
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            device = PARSER.parse(f.read())
+        return (ip, device['mac'], device['vendor'], device['hostname'], device['first_seen'],
+                device['last_seen'], device['os_info'], device['services'], device['vulnerabilities'])
+    except Exception as e:
+        print(f"nMapping+: Error processing device file {filepath}: {e}")
+        return None
+
+
+def timed_parse_device_file(ip, filepath):
+    """parse_device_file() returning (row, seconds), for pool workers to report parse time"""
+    start = time.perf_counter()
+    row = parse_device_file(ip, filepath)
+    return row, time.perf_counter() - start
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+nMapping+ File Watcher
+Reports files written to or deleted from the scanner data directory,
+using inotify where available and polling file metadata otherwise.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+# inotify event masks, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class WatchOverflow(Exception):
+    """Events were lost; the caller should fall back to a full sync"""
+
+
+class InotifyBackend:
+    """Non-recursive inotify watch on one directory"""
+
+    # Files are reported once fully written (or renamed into place) and when removed
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {path}')
+
+    def read(self, timeout):
+        """Return names of files touched within timeout seconds"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        return self.parse(data)
+
+    def parse(self, data):
+        """File names in a buffer of inotify events"""
+        names = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & (IN_Q_OVERFLOW | IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                raise WatchOverflow(f'inotify event mask {mask:#x}')
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def drain(self):
+        """Return names of files in the events queued so far, without waiting"""
+        names = set()
+        try:
+            while True:
+                data = os.read(self.fd, 64 * 1024)
+                if not data:
+                    break
+                names |= self.parse(data)
+        except BlockingIOError:
+            pass
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingBackend:
+    """Compare file mtimes and sizes every interval; no file contents are read"""
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.fingerprints = self.scan()
+
+    def scan(self):
+        fingerprints = {}
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    fingerprints[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return fingerprints
+
+    def read(self, timeout):
+        """Return names of files added, changed or removed since the last poll"""
+        time.sleep(min(timeout, self.interval))
+        return self.drain()
+
+    def drain(self):
+        """Return names of files added, changed or removed since the last poll, without waiting"""
+        fingerprints = self.scan()
+        names = {name for name, fingerprint in fingerprints.items() if self.fingerprints.get(name) != fingerprint}
+        names |= set(self.fingerprints) - set(fingerprints)
+        self.fingerprints = fingerprints
+        return names
+
+    def close(self):
+        pass
+
+
+class FileWatcher:
+    """Collect touched files and hand them over in debounced batches"""
+
+    def __init__(self, path, on_batch, file_filter=None, on_overflow=None, backend='auto',
+                 debounce=2.0, max_delay=30.0, poll_interval=5.0):
+        self.path = path
+        # on_batch(names) receives each debounced set of file names
+        self.on_batch = on_batch
+        self.file_filter = file_filter or (lambda name: True)
+        # on_overflow() is called when events may have been lost
+        self.on_overflow = on_overflow
+        self.backend = backend
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.thread = None
+        self.current_backend = None
+        # Open suppress() blocks, and a count of their starts and ends so that
+        # reads overlapping one are recognised
+        self.suppressed = 0
+        self.suppress_generation = 0
+        self.suppress_lock = threading.Lock()
+        # Names read while a block runs, the files the last block's own work
+        # changed, and held names to hand on with the next batch
+        self.held = set()
+        self.own_changes = set()
+        self.requeued = set()
+
+    def open_backend(self):
+        """inotify unless polling was requested or inotify is unavailable"""
+        if self.backend != 'polling':
+            try:
+                return InotifyBackend(self.path)
+            except (OSError, AttributeError) as e:
+                if self.backend == 'inotify':
+                    raise
+                print(f"nMapping+: inotify unavailable ({e}), polling {self.path} "
+                      f"every {self.poll_interval:g}s")
+        return PollingBackend(self.path, self.poll_interval)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='file-watcher', daemon=True)
+        self.thread.start()
+
+    @contextmanager
+    def suppress(self):
+        """Hold back file events while the block runs, e.g. the dashboard's own git pull
+
+        The block adds the names of the files its own work changed to the
+        yielded set. When it ends, events for those files are dropped,
+        including ones still queued, so they do not come back as a watch
+        batch. Events for any other file go into the next batch.
+        """
+        own_changes = set()
+        with self.suppress_lock:
+            self.suppressed += 1
+            self.suppress_generation += 1
+        try:
+            yield own_changes
+        finally:
+            queued = set()
+            backend = self.current_backend
+            if backend is not None:
+                try:
+                    queued = backend.drain()
+                except WatchOverflow as e:
+                    print(f"nMapping+: File watch lost events ({e}), requesting a full sync")
+                    if self.on_overflow:
+                        self.on_overflow()
+                except OSError as e:
+                    print(f"nMapping+: Reading held file events failed: {e}")
+            with self.suppress_lock:
+                self.suppressed -= 1
+                self.suppress_generation += 1
+                self.own_changes = own_changes
+                self.requeued |= (self.held | queued) - own_changes
+                if not self.suppressed:
+                    self.held = set()
+
+    def read_unsuppressed(self, backend, timeout):
+        """backend.read(), with events held back while a suppress() block runs"""
+        with self.suppress_lock:
+            generation = self.suppress_generation
+        names = backend.read(timeout)
+        with self.suppress_lock:
+            if self.suppressed:
+                self.held |= names
+                return set()
+            if generation != self.suppress_generation:
+                # The read overlapped the end of a block
+                names -= self.own_changes
+            names |= self.requeued
+            self.requeued = set()
+        return names
+
+    def run(self):
+        """Watch until the process exits, reopening the backend after errors"""
+        while True:
+            try:
+                backend = self.open_backend()
+            except OSError as e:
+                print(f"nMapping+: File watch on {self.path} failed: {e}")
+                time.sleep(max(self.poll_interval, 30))
+                continue
+            self.current_backend = backend
+            try:
+                self.watch(backend)
+            except WatchOverflow as e:
+                print(f"nMapping+: File watch lost events ({e}), requesting a full sync")
+                if self.on_overflow:
+                    self.on_overflow()
+            except Exception as e:
+                print(f"nMapping+: File watch error: {e}")
+                time.sleep(self.poll_interval)
+            finally:
+                self.current_backend = None
+                backend.close()
+
+    def watch(self, backend):
+        """Gather touched files until they settle, then pass them on"""
+        pending = set()
+        first_event = last_event = None
+        while True:
+            if pending:
+                now = time.monotonic()
+                # Quiet for the debounce period, or busy for too long
+                timeout = min(last_event + self.debounce, first_event + self.max_delay) - now
+                if timeout <= 0:
+                    batch, pending = pending, set()
+                    first_event = last_event = None
+                    self.on_batch(batch)
+                    continue
+            else:
+                timeout = self.poll_interval
+
+            names = {name for name in self.read_unsuppressed(backend, timeout) if self.file_filter(name)}
+            if names:
+                last_event = time.monotonic()
+                first_event = first_event or last_event
+                pending |= names
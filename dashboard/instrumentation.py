@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Instrumentation
+Counters, gauges and histograms exposed in the Prometheus text format.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds, from a fast query up to a slow full sync
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def format_value(value):
+    """Sample value as Prometheus expects it"""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(pairs):
+    """{name="value",...}, or nothing without labels"""
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Metric:
+    """A named metric with one value per combination of label values"""
+
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels):
+        """Current value, 0 before the first update"""
+        with self.lock:
+            return self.values.get(self.key(labels), 0)
+
+    def set(self, value, **labels):
+        """Replace a value, e.g. with a total kept elsewhere"""
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def samples(self):
+        """Yield (name suffix, label pairs, value) for every sample"""
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield '', list(zip(self.labelnames, key)), value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, pairs, value in self.samples():
+            lines.append(f'{self.name}{suffix}{format_labels(pairs)} {format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Value that only goes up; name it with a _total suffix"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their count and sum"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self.values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', pairs + [('le', format_value(float(bound)))], cumulative
+            yield '_sum', pairs, total
+            yield '_count', pairs, cumulative
+
+
+class MetricsRegistry:
+    """The metrics of one process, rendered together for a scrape"""
+
+    def __init__(self):
+        self.metrics = []
+        # Called before each render, e.g. to copy connection pool stats into gauges
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collect):
+        self.collectors.append(collect)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"nMapping+: Metrics collector failed: {e}")
+        return '\n'.join(metric.render() for metric in self.metrics) + '\n'
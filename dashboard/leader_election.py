@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Leader Election
+Picks the one dashboard process that runs background work when several
+workers serve the same database, using an exclusive lock on a shared file.
+"""
+
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where the dashboard runs as a single process
+    fcntl = None
+
+
+class LeaderElection:
+    """Hold an exclusive flock on a file; the holder is the leader until it exits
+
+    The lock goes away with the process that held it, so a crashed leader
+    never has to be cleaned up after. Followers keep trying and take over
+    within retry_interval seconds.
+    """
+
+    def __init__(self, path, on_elected, retry_interval=10):
+        self.path = path
+        # Called once, on the thread that acquired the lock
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        self.file = None
+        self.elected_at = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def is_leader(self):
+        return self.elected_at is not None
+
+    def start(self):
+        """Try to become the leader now, and keep trying in the background if another process is"""
+        if self.try_acquire():
+            return
+        self.thread = threading.Thread(target=self.run, name='leader-election', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.try_acquire():
+            time.sleep(self.retry_interval)
+
+    def try_acquire(self):
+        """Take the lock if it is free, returns True once this process leads"""
+        with self.lock:
+            if self.is_leader:
+                return True
+            if fcntl is not None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                file = open(self.path, 'a+')
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    file.close()
+                    return False
+                # Who holds it, for operators looking at the file
+                file.seek(0)
+                file.truncate()
+                file.write(f"{socket.gethostname()} {os.getpid()} {datetime.now().isoformat()}\n")
+                file.flush()
+                self.file = file
+            self.elected_at = datetime.now().isoformat()
+
+        print(f"nMapping+: Process {os.getpid()} elected sync leader")
+        self.on_elected()
+        return True
+
+    def holder(self):
+        """Contents of the lock file: host, pid and election time of the current leader"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def status(self):
+        """Summary of the election state for health checks"""
+        return {
+            'leader': self.is_leader,
+            'pid': os.getpid(),
+            'elected_at': self.elected_at,
+            'holder': self.holder(),
+        }
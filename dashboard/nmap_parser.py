@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Nmap XML Parser
+Streaming parser for nmap -oX output: hosts are read one at a time and
+discarded once parsed, so memory use does not grow with the scan size.
+"""
+
+import re
+import xml.etree.ElementTree as ET
+
+# Port states the services table is filled with, as in DeviceMarkdownParser
+SERVICE_STATES = ('open', 'open|filtered', 'filtered', 'closed')
+# OS matches kept per host, best first
+OS_MATCHES = 3
+
+CVE_PATTERN = re.compile(r'CVE-\d{4}-\d{4,}', re.IGNORECASE)
+
+
+class NmapXMLParser:
+    """Yield one dict per host that is up, in the order nmap wrote them"""
+
+    def iter_hosts(self, source):
+        """Parse a file name or binary file object, e.g. a request stream or stdin
+
+        Raises ValueError for input that is not well-formed nmap XML; hosts
+        yielded before the error are complete.
+        """
+        root = None
+        scan_start = None
+        try:
+            for event, element in ET.iterparse(source, events=('start', 'end')):
+                if root is None:
+                    if element.tag != 'nmaprun':
+                        raise ValueError(f"Not nmap XML output (root element <{element.tag}>)")
+                    root = element
+                    scan_start = self.parse_time(element.get('start'))
+                    continue
+                if event != 'end' or element.tag != 'host':
+                    continue
+                host = self.parse_host(element, scan_start)
+                # Drop every finished child of <nmaprun>, not just this host
+                root.clear()
+                if host:
+                    yield host
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid nmap XML: {e}") from None
+        if root is None:
+            raise ValueError('Empty nmap XML input')
+
+    def parse_time(self, value):
+        """nmap epoch attribute as an int, or None"""
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def parse_host(self, element, scan_start=None):
+        """Turn a <host> element into a dict, or None for hosts that are down
+
+        services and service_entries are None without a <ports> element (a
+        ping scan), vulnerabilities is None when no scripts ran, so that
+        callers can keep what an earlier scan found.
+        """
+        status = element.find('status')
+        if status is not None and status.get('state') != 'up':
+            return None
+
+        host = {'ip': None, 'mac': '', 'vendor': ''}
+        for address in element.iter('address'):
+            addrtype = address.get('addrtype')
+            if addrtype in ('ipv4', 'ipv6') and host['ip'] is None:
+                host['ip'] = address.get('addr')
+            elif addrtype == 'mac':
+                host['mac'] = address.get('addr', '')
+                host['vendor'] = address.get('vendor', '')
+        if not host['ip']:
+            return None
+
+        hostname = element.find('hostnames/hostname')
+        host['hostname'] = hostname.get('name', '') if hostname is not None else ''
+        host['scanned_at'] = (self.parse_time(element.get('endtime')) or self.parse_time(element.get('starttime'))
+                              or scan_start)
+
+        scripts = []
+        ports = element.find('ports')
+        if ports is None:
+            host['services'] = host['service_entries'] = None
+        else:
+            lines, entries = [], {}
+            for port in ports.iter('port'):
+                entry = self.parse_port(port)
+                # The services table holds one row per port and protocol
+                if entry is None or entry[:2] in entries:
+                    continue
+                entries[entry[:2]] = entry
+                lines.append(' '.join(str(part) for part in (f'{entry[0]}/{entry[1]}', *entry[2:]) if part))
+                for script in port.iter('script'):
+                    scripts.append((f'{entry[0]}/{entry[1]}', script))
+                    lines += self.format_script(script)
+            host['services'] = '\n'.join(lines)
+            host['service_entries'] = list(entries.values())
+
+        os_lines = [
+            f"OS: {match.get('name')} ({match.get('accuracy', '?')}%)"
+            for match in element.findall('os/osmatch')[:OS_MATCHES]
+        ]
+        host_scripts = element.findall('hostscript/script')
+        if host_scripts:
+            os_lines.append('Host script results:')
+            for script in host_scripts:
+                scripts.append((None, script))
+                os_lines += self.format_script(script)
+        host['os_info'] = '\n'.join(os_lines)
+
+        host['vulnerabilities'] = self.format_vulnerabilities(scripts) if scripts else None
+        return host
+
+    def parse_port(self, port):
+        """(port, protocol, state, name, version) of a <port>, or None for other states"""
+        state = port.find('state')
+        state = state.get('state', '') if state is not None else ''
+        if state not in SERVICE_STATES:
+            return None
+
+        service = port.find('service')
+        name, version = '', ''
+        if service is not None:
+            name = service.get('name', '')
+            if name and service.get('tunnel'):
+                name = f"{service.get('tunnel')}/{name}"
+            version = ' '.join(part for part in (service.get('product'), service.get('version')) if part)
+            if service.get('extrainfo'):
+                version = f"{version} ({service.get('extrainfo')})".strip()
+        return (int(port.get('portid')), port.get('protocol', 'tcp').lower(), state, name, version)
+
+    def format_script(self, script):
+        """Script output as nmap's normal output shows it below a port"""
+        output = [line for line in (script.get('output') or '').strip().splitlines() if line.strip()]
+        lines = [f"{script.get('id')}: {output[0].strip() if output else ''}".rstrip()] + output[1:]
+        return [('|_' if index == len(lines) - 1 else '| ') + line for index, line in enumerate(lines)]
+
+    def format_vulnerabilities(self, scripts):
+        """One "- " line per CVE, or per script reporting VULNERABLE without one"""
+        lines = []
+        for port, script in scripts:
+            output = script.get('output') or ''
+            where = f"{script.get('id')}, {port}" if port else script.get('id')
+            cves = dict.fromkeys(cve.upper() for cve in CVE_PATTERN.findall(output))
+            if cves:
+                lines += [f'- {cve} ({where})' for cve in cves]
+            elif 'VULNERABLE' in output:
+                lines.append(f'- {where}')
+        return '\n'.join(dict.fromkeys(lines))
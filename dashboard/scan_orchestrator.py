@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Scan Orchestrator
+Runs the networks in targets.conf through nmap as shards, several at a time,
+and ingests each shard's XML into the dashboard as soon as it completes.
+
+Usage: python3 scan_orchestrator.py [--targets /nmap/config/targets.conf]
+                                    [--config /nmap/config/scanner.conf] [--direct]
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import re
+import shlex
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from ingest_nmap import DEFAULT_URL, post_xml
+
+TARGETS_PATH = '/nmap/config/targets.conf'
+CONFIG_PATH = '/nmap/config/scanner.conf'
+
+# nmap options per SCAN_TYPE; NMAP_ARGS in scanner.conf is appended to them
+SCAN_PROFILES = {
+    'discovery': ['-sn'],
+    'fast': ['-F', '-T4'],
+    'full': ['-p-', '-sV', '-O', '--osscan-limit', '-T4'],
+    'fingerprint': ['-sV', '-O', '--osscan-limit'],
+    'vuln': ['-sV', '--script', 'vuln'],
+    'custom': [],
+}
+
+# scanner.conf keys and their defaults; SCHEDULE belongs to the cron entry
+# that runs the orchestrator
+DEFAULT_CONFIG = {
+    'SCAN_TYPE': 'fast',
+    'NMAP_ARGS': '',
+    'EXCLUDE': '',
+    'SHARD_PREFIX': '24',
+    'SHARD_PREFIX6': '120',
+    'MAX_PARALLEL': '4',
+    'SHARD_TIMEOUT': '1800',
+    'SHARD_RETRIES': '2',
+    'RETRY_DELAY': '30',
+    'NMAP': 'nmap',
+    'DASHBOARD_URL': DEFAULT_URL,
+}
+
+# Refuse target lists that would take more shards than this, e.g. an IPv6 /64
+MAX_SHARDS = 65536
+
+
+def load_config(path):
+    """scanner.conf as a dict: shell-style KEY=VALUE lines, # comments, defaults for missing keys"""
+    config = dict(DEFAULT_CONFIG)
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                key, sep, value = words[0].partition('=')
+                if not sep or len(words) > 1:
+                    raise ValueError(f"{path}:{number}: expected KEY=VALUE, got {line.strip()!r}")
+                config[key.strip().upper()] = value.strip()
+    return config
+
+
+def load_targets(path):
+    """Targets in targets.conf: one CIDR, address, range or hostname per line, # comments"""
+    targets = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            targets += line.split('#', 1)[0].split()
+    return targets
+
+
+def target_networks(target):
+    """Networks covering a CIDR, address or IPv4 last-octet range (10.0.5.1-50, 10.0.5.*), else None"""
+    try:
+        return [ipaddress.ip_network(target, strict=False)]
+    except ValueError:
+        pass
+    match = re.fullmatch(r'(\d+\.\d+\.\d+)\.(?:(\d+)-(\d+)|\*)', target)
+    if not match:
+        return None
+    first, last = (int(match[2]), int(match[3])) if match[2] else (0, 255)
+    try:
+        start = ipaddress.IPv4Address(f'{match[1]}.{first}')
+        end = ipaddress.IPv4Address(f'{match[1]}.{last}')
+    except ValueError:
+        return None
+    if start > end:
+        return None
+    return list(ipaddress.summarize_address_range(start, end))
+
+
+def split_targets(targets, prefix=24, prefix6=120, exclude=()):
+    """Split targets into shards, each a list of nmap target strings
+
+    Networks larger than the shard prefix are cut into shard-sized subnets.
+    Last-octet ranges become the networks they cover. Smaller networks are
+    packed together up to the size of one shard, and subnets entirely inside
+    an excluded network are dropped. Hostnames and other nmap target forms
+    are not split: each is passed on as written and counted as one address.
+    """
+    excluded = []
+    for entry in exclude:
+        try:
+            excluded.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            pass
+
+    def is_excluded(network):
+        return any(network.version == other.version and network.subnet_of(other) for other in excluded)
+
+    shards, pending, pending_size = [], [], 0
+
+    def add(entry, size, shard_size):
+        nonlocal pending, pending_size
+        if pending and pending_size + size > shard_size:
+            shards.append(pending)
+            pending, pending_size = [], 0
+        pending.append(entry)
+        pending_size += size
+
+    for target in targets:
+        networks = target_networks(target)
+        if networks is None:
+            add(target, 1, 2 ** (32 - prefix))
+            continue
+
+        for network in networks:
+            if is_excluded(network):
+                continue
+            bits, shard_prefix = (32, prefix) if network.version == 4 else (128, prefix6)
+            if network.prefixlen < shard_prefix:
+                count = 2 ** (shard_prefix - network.prefixlen)
+                if len(shards) + count > MAX_SHARDS:
+                    raise ValueError(
+                        f"{target} would take {count} shards of /{shard_prefix}, the limit is {MAX_SHARDS}")
+                shards += [[str(subnet)] for subnet in network.subnets(new_prefix=shard_prefix)
+                           if not is_excluded(subnet)]
+            else:
+                add(str(network), network.num_addresses, 2 ** (bits - shard_prefix))
+    if pending:
+        shards.append(pending)
+    return shards
+
+
+class ScanOrchestrator:
+    """Bounded-concurrency nmap runs with per-shard timeouts and retries"""
+
+    def __init__(self, nmap_args, ingest, exclude=(), nmap='nmap', max_parallel=4, timeout=1800,
+                 retries=2, retry_delay=30):
+        self.nmap_args = list(nmap_args)
+        # ingest(path) -> ingest summary dict; called in a worker thread as
+        # each shard completes, so it may block on the database or network
+        self.ingest = ingest
+        self.exclude = list(exclude)
+        self.nmap = nmap
+        self.max_parallel = max_parallel
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+
+    def command(self, targets, output):
+        """nmap command line for one shard, writing XML to output"""
+        command = [self.nmap, *self.nmap_args, '-oX', output]
+        if self.exclude:
+            command += ['--exclude', ','.join(self.exclude)]
+        return command + list(targets)
+
+    def run(self, shards):
+        """Scan every shard and return a summary of the run"""
+        return asyncio.run(self.run_shards(shards))
+
+    async def run_shards(self, shards):
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        with tempfile.TemporaryDirectory(prefix='nmapping-scan-') as workdir:
+            results = await asyncio.gather(*(
+                self.run_shard(semaphore, workdir, index, shard, len(shards))
+                for index, shard in enumerate(shards)
+            ))
+
+        summary = {'shards': len(shards), 'succeeded': 0, 'failed': [], 'hosts': 0, 'added': 0, 'updated': 0}
+        for shard, result in zip(shards, results):
+            if result is None:
+                summary['failed'].append(' '.join(shard))
+                continue
+            summary['succeeded'] += 1
+            for key in ('hosts', 'added', 'updated'):
+                summary[key] += result.get(key, 0)
+        summary['seconds'] = round(time.perf_counter() - start, 3)
+        return summary
+
+    async def run_shard(self, semaphore, workdir, index, shard, total):
+        """Scan one shard with retries, then ingest it; returns the ingest summary or None"""
+        label = f"Shard {index + 1}/{total} ({' '.join(shard[:3])}{' ...' if len(shard) > 3 else ''})"
+        output = os.path.join(workdir, f'shard-{index}.xml')
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # Back off before each retry, without holding a scan slot
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            async with semaphore:
+                error = await self.scan(shard, output)
+            if error is None:
+                break
+            print(f"nMapping+: {label} attempt {attempt + 1}/{self.retries + 1} failed: {error}")
+        else:
+            return None
+
+        try:
+            result = await asyncio.to_thread(self.ingest, output)
+        except Exception as e:
+            result = {'error': str(e)}
+        finally:
+            os.remove(output)
+        if result.get('error'):
+            print(f"nMapping+: {label} ingest failed: {result['error']}")
+            return None
+        print(f"nMapping+: {label} done: {result.get('hosts', 0)} hosts up, "
+              f"{result.get('added', 0)} added, {result.get('updated', 0)} updated")
+        return result
+
+    async def scan(self, targets, output):
+        """Run nmap once; returns None on success or an error message"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *self.command(targets, output),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            return f"cannot run {self.nmap}: {e}"
+
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return f"timed out after {self.timeout:g}s"
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', 'replace').strip().splitlines()
+            return f"nmap exited with {process.returncode}" + (f": {message[-1]}" if message else '')
+        if not os.path.exists(output):
+            return 'nmap wrote no XML output'
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan the networks in targets.conf and ingest the results')
+    parser.add_argument('--targets', default=TARGETS_PATH, help=f'target list (default: {TARGETS_PATH})')
+    parser.add_argument('--config', default=CONFIG_PATH, help=f'scanner options (default: {CONFIG_PATH})')
+    parser.add_argument('--scan-type', help='override SCAN_TYPE from the config')
+    parser.add_argument('--direct', action='store_true',
+                        help='write to the dashboard database directly instead of posting to DASHBOARD_URL')
+    args = parser.parse_args()
+
+    try:
+        config = load_config(args.config)
+        scan_type = (args.scan_type or config['SCAN_TYPE']).lower()
+        if scan_type not in SCAN_PROFILES:
+            raise ValueError(f"Unknown SCAN_TYPE {scan_type!r}, expected one of {', '.join(SCAN_PROFILES)}")
+        nmap_args = SCAN_PROFILES[scan_type] + shlex.split(config['NMAP_ARGS'])
+        if not nmap_args:
+            raise ValueError('SCAN_TYPE=custom needs NMAP_ARGS')
+        exclude = config['EXCLUDE'].replace(',', ' ').split()
+        shards = split_targets(load_targets(args.targets), int(config['SHARD_PREFIX']),
+                               int(config['SHARD_PREFIX6']), exclude)
+    except (OSError, ValueError) as e:
+        sys.exit(f"nMapping+: {e}")
+    if not shutil.which(config['NMAP']):
+        sys.exit(f"nMapping+: {config['NMAP']} not found on PATH")
+
+    # Every shard of this run adds to one scans row
+    params = {'scan_type': scan_type, 'accumulate': '1',
+              'scan_file': f"{scan_type}_{datetime.now():%Y-%m-%d_%H%M%S}_{uuid.uuid4().hex[:8]}.xml"}
+    if args.direct:
+        os.environ.setdefault('NMAPPING_BACKGROUND_SYNC', '0')
+        import dashboard_app
+
+        def ingest(path):
+            return dashboard_app.dashboard.ingest_nmap_xml(
+                path, scan_type=scan_type, scan_file=params['scan_file'], accumulate=True)
+    else:
+        def ingest(path):
+            with open(path, 'rb') as f:
+                return post_xml(f, config['DASHBOARD_URL'], params)
+
+    orchestrator = ScanOrchestrator(
+        nmap_args, ingest, exclude=exclude, nmap=config['NMAP'],
+        max_parallel=int(config['MAX_PARALLEL']), timeout=float(config['SHARD_TIMEOUT']),
+        retries=int(config['SHARD_RETRIES']), retry_delay=float(config['RETRY_DELAY']))
+    print(f"nMapping+: Scanning {len(shards)} shards ({scan_type}), {orchestrator.max_parallel} at a time")
+    summary = orchestrator.run(shards)
+    print(f"nMapping+: Scan finished in {summary['seconds']:.1f}s: {summary['succeeded']}/{summary['shards']} "
+          f"shards, {summary['hosts']} hosts up, {summary['added']} added, {summary['updated']} updated")
+    for shard in summary['failed']:
+        print(f"nMapping+: Failed shard: {shard}")
+    if summary['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Sync Scheduler
+Runs scanner syncs on a single worker thread, periodically and on request.
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+
+def new_job_record(reason):
+    """A queued sync job, as reported on /api/sync/<id> and in sync_progress events"""
+    return {
+        'id': uuid.uuid4().hex,
+        'reason': reason,
+        'state': 'queued',
+        'stage': None,
+        'progress': {},
+        'files': None,
+        'error': None,
+        'requested_at': datetime.now().isoformat(),
+        'started_at': None,
+        'finished_at': None,
+    }
+
+
+class SyncScheduler:
+    """Single-flight sync jobs with a jittered interval and backoff after failures"""
+
+    def __init__(self, run_sync, interval=300, jitter=0.1, max_backoff=3600, history=50, on_progress=None):
+        # run_sync(progress, files) -> bool, calling progress(stage, **details) as
+        # it goes; files is a set of file names to ingest, or None for a full sync
+        self.run_sync = run_sync
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max(max_backoff, interval)
+        self.history = history
+        # Called with a copy of a job whenever its state or progress changes
+        self.on_progress = on_progress
+        self.jobs = OrderedDict()
+        self.pending = None
+        self.pending_files = None
+        self.running = None
+        self.failures = 0
+        self.next_run = time.monotonic()
+        self.condition = threading.Condition()
+        self.thread = None
+        # Serializes syncs run by run_now
+        self.run_lock = threading.Lock()
+
+    def start(self):
+        """Start the worker thread; the first sync runs right away"""
+        self.thread = threading.Thread(target=self.run, name='sync-scheduler', daemon=True)
+        self.thread.start()
+
+    def request(self, reason='manual', files=None):
+        """Queue a sync and return its job; requests made before it starts share the same job
+
+        With files, only those files are ingested. Merged into a queued job,
+        they widen its file set, or are covered by the full sync it already is.
+        """
+        with self.condition:
+            if self.pending is None:
+                self.pending = self.new_job(reason)
+                self.pending_files = set(files) if files is not None else None
+                self.condition.notify()
+            elif files is None:
+                self.pending_files = None
+            elif self.pending_files is not None:
+                self.pending_files |= set(files)
+            self.pending['files'] = len(self.pending_files) if self.pending_files is not None else None
+            return dict(self.pending)
+
+    def run_now(self, reason='manual', files=None):
+        """Run a sync on the calling thread and return the finished job
+
+        For when the worker thread is not started; calls run one at a time.
+        """
+        with self.run_lock:
+            with self.condition:
+                job = self.new_job(reason)
+                job['files'] = len(files) if files is not None else None
+            self.execute(job, set(files) if files is not None else None)
+            return self.get_job(job['id'])
+
+    def get_job(self, job_id):
+        """Return a copy of a recent job, or None"""
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def status(self):
+        """Summary of the scheduler state for health checks"""
+        with self.condition:
+            return {
+                'running': self.running['id'] if self.running else None,
+                'pending': self.pending['id'] if self.pending else None,
+                'consecutive_failures': self.failures,
+                'next_run_in': max(0, round(self.next_run - time.monotonic())),
+            }
+
+    def new_job(self, reason):
+        """Create and remember a queued job; caller holds the lock"""
+        job = new_job_record(reason)
+        self.jobs[job['id']] = job
+        while len(self.jobs) > self.history:
+            self.jobs.popitem(last=False)
+        return job
+
+    def next_delay(self):
+        """Seconds until the next scheduled sync, doubling per consecutive failure"""
+        delay = min(self.interval * 2 ** self.failures, self.max_backoff)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def run(self):
+        """Worker loop: wait for a request or the next scheduled time, then sync"""
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    delay = self.next_run - time.monotonic()
+                    if delay <= 0:
+                        self.pending = self.new_job('scheduled')
+                        break
+                    self.condition.wait(delay)
+                job, self.pending = self.pending, None
+                files, self.pending_files = self.pending_files, None
+            self.execute(job, files)
+
+    def execute(self, job, files):
+        """Run one job's sync and record how it went"""
+        with self.condition:
+            self.running = job
+            job['state'] = 'running'
+            job['started_at'] = datetime.now().isoformat()
+        self.notify(job)
+
+        try:
+            success = self.run_sync(lambda stage, **details: self.update(job, stage, details), files)
+            error = None if success else job['progress'].get('error', 'Sync failed')
+        except Exception as e:
+            success, error = False, str(e)
+
+        with self.condition:
+            self.failures = 0 if success else self.failures + 1
+            # A completed full sync, requested or not, restarts the interval;
+            # after a failure the backed-off retry is always rescheduled
+            if files is None or not success:
+                self.next_run = time.monotonic() + self.next_delay()
+            job['state'] = 'succeeded' if success else 'failed'
+            job['error'] = error
+            job['finished_at'] = datetime.now().isoformat()
+            self.running = None
+        self.notify(job)
+
+    def update(self, job, stage, details):
+        """Record a progress report from the running sync"""
+        with self.condition:
+            job['stage'] = stage
+            job['progress'] = details
+        self.notify(job)
+
+    def notify(self, job):
+        """Pass a snapshot of the job to on_progress"""
+        if self.on_progress:
+            with self.condition:
+                snapshot = dict(job)
+            try:
+                self.on_progress(snapshot)
+            except Exception as e:
+                print(f"nMapping+: Sync progress callback failed: {e}")
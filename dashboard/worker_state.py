@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+nMapping+ Worker State
+State that every dashboard worker process needs to agree on: the devices
+delta sequence and history, sync requests made on workers that are not the
+leader, and the state of recent sync jobs.
+
+It lives in its own small SQLite database, next to dashboard.db, so that
+its short writes never wait behind a long sync transaction.
+"""
+
+import json
+import time
+
+from connection_pool import ConnectionPool
+
+
+class WorkerState:
+    """Shared delta log, sync request queue and sync job states"""
+
+    def __init__(self, db_path, delta_history=100, job_history=50, pool_size=4, busy_timeout_ms=5000):
+        self.delta_history = delta_history
+        self.job_history = job_history
+        self.pool = ConnectionPool(db_path, pool_size, busy_timeout_ms=busy_timeout_ms,
+                                   pragmas=('journal_mode = WAL', 'synchronous = NORMAL'))
+        with self.pool.connection() as conn, conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS deltas (
+                    sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+                    body TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_requests (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    reason TEXT NOT NULL,
+                    job_id TEXT,
+                    requested_at REAL NOT NULL
+                )
+            ''')
+            # Job id handed to the requester before the leader has taken the request
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(sync_requests)')}
+            if 'ticket' not in columns:
+                conn.execute('ALTER TABLE sync_requests ADD COLUMN ticket TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sync_requests_ticket ON sync_requests(ticket)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_jobs (
+                    id TEXT PRIMARY KEY,
+                    body TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_sync_jobs_updated_at ON sync_jobs(updated_at)')
+
+    def publish_delta(self, delta):
+        """Store a delta under the next sequence number and return the number"""
+        with self.pool.connection() as conn, conn:
+            sequence = conn.execute('INSERT INTO deltas (body) VALUES (?)', (json.dumps(delta),)).lastrowid
+            conn.execute('DELETE FROM deltas WHERE sequence <= ?', (sequence - self.delta_history,))
+        return sequence
+
+    def latest_sequence(self):
+        """Sequence number of the newest delta, 0 before the first"""
+        with self.pool.connection() as conn:
+            return conn.execute('SELECT COALESCE(MAX(sequence), 0) FROM deltas').fetchone()[0]
+
+    def deltas_since(self, sequence):
+        """Deltas after a sequence number, oldest first, or None if some are no longer kept"""
+        with self.pool.connection() as conn:
+            latest = conn.execute('SELECT COALESCE(MAX(sequence), 0) FROM deltas').fetchone()[0]
+            if sequence > latest:
+                return None
+            rows = conn.execute('''
+                SELECT sequence, body FROM deltas WHERE sequence > ? AND sequence <= ? ORDER BY sequence
+            ''', (sequence, latest)).fetchall()
+        if len(rows) != latest - sequence:
+            return None
+        return [{**json.loads(row['body']), 'sequence': row['sequence']} for row in rows]
+
+    def add_sync_request(self, job):
+        """Ask the leader for a sync, without waiting for it
+
+        job is a queued job record whose id becomes the request's ticket:
+        get_sync_job(ticket) returns it until the leader takes the request,
+        then the job the leader queued for it.
+        """
+        # Saved first, so the leader never takes the request before its job exists
+        self.save_sync_job(job)
+        with self.pool.connection() as conn, conn:
+            conn.execute('INSERT INTO sync_requests (reason, ticket, requested_at) VALUES (?, ?, ?)',
+                         (job['reason'], job['id'], time.time()))
+
+    def take_sync_requests(self, queue_sync, max_age=3600):
+        """Leader side: queue_sync(reason) -> job for each new request, and record the job ids
+
+        Requests left untaken for max_age seconds, while no leader ran, are dropped.
+        """
+        with self.pool.connection() as conn:
+            requests = conn.execute('''
+                SELECT id, reason, ticket FROM sync_requests WHERE job_id IS NULL AND requested_at >= ? ORDER BY id
+            ''', (time.time() - max_age,)).fetchall()
+        if not requests:
+            return 0
+        resolved = [(queue_sync(row['reason'])['id'], row['id']) for row in requests]
+        with self.pool.connection() as conn, conn:
+            conn.executemany('UPDATE sync_requests SET job_id = ? WHERE id = ?', resolved)
+            # Tickets now lead to the leader's jobs
+            conn.executemany('DELETE FROM sync_jobs WHERE id = ?', [(row['ticket'],) for row in requests])
+            conn.execute('DELETE FROM sync_requests WHERE requested_at < ?', (time.time() - max_age,))
+        return len(resolved)
+
+    def save_sync_job(self, job):
+        """Record the latest state of a sync job, keeping the newest job_history jobs"""
+        with self.pool.connection() as conn, conn:
+            conn.execute('''
+                INSERT INTO sync_jobs (id, body, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET body = excluded.body, updated_at = excluded.updated_at
+            ''', (job['id'], json.dumps(job), time.time()))
+            conn.execute('''
+                DELETE FROM sync_jobs WHERE id NOT IN (
+                    SELECT id FROM sync_jobs ORDER BY updated_at DESC LIMIT ?
+                )
+            ''', (self.job_history,))
+
+    def get_sync_job(self, job_id):
+        """Last recorded state of a sync job or of the job a request ticket led to, or None"""
+        with self.pool.connection() as conn:
+            request = conn.execute(
+                'SELECT job_id FROM sync_requests WHERE ticket = ? AND job_id IS NOT NULL', (job_id,)).fetchone()
+            if request:
+                job_id = request['job_id']
+            row = conn.execute('SELECT body FROM sync_jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row['body']) if row else None
@@ -293,6 +293,8 @@ setup_python_environment()
 dnspython==2.4.2
 bidict==0.22.1
 python-engineio==4.7.1
+msgpack==1.0.7
+Brotli==1.1.0
 EOF
     
     sudo -u "$DASHBOARD_USER" "$DASHBOARD_DIR/venv/bin/pip" install -r "$DASHBOARD_DIR/requirements.txt" &>/dev/null
@@ -668,6 +670,13 @@ main()
         cp ./dashboard_app.py "$DASHBOARD_DIR/"
         chown "$DASHBOARD_USER:$DASHBOARD_USER" "$DASHBOARD_DIR/dashboard_app.py"
         chmod 755 "$DASHBOARD_DIR/dashboard_app.py"
+        for module in ./device_parser.py ./connection_pool.py ./sync_scheduler.py ./file_watcher.py ./instrumentation.py \
+                      ./nmap_parser.py ./ingest_nmap.py ./scan_orchestrator.py ./leader_election.py ./worker_state.py; do
+            if [ -f "$module" ]; then
+                cp "$module" "$DASHBOARD_DIR/"
+                chown "$DASHBOARD_USER:$DASHBOARD_USER" "$DASHBOARD_DIR/$(basename "$module")"
+            fi
+        done
         msg_ok "Dashboard application copied"
     fi
     
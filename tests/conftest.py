@@ -0,0 +1,6 @@
+"""Make the dashboard modules importable from the tests"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'dashboard'))
@@ -0,0 +1,95 @@
+"""Device change history tests, against a dashboard in a scratch directory"""
+
+import importlib
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+DEVICE_FILE = '''---
+ip: {ip}
+---
+# Device {ip}
+
+**MAC:** 00:11:22:33:44:55
+**Vendor:** Acme
+**Hostname:** printer
+**First Seen:** 2025-01-01
+**Last Seen:** {last_seen}
+
+## OS & Services
+
+- 9100/tcp open jetdirect
+'''
+
+
+class Clock:
+    """Stands in for the time module with a settable time()"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@pytest.fixture(scope='module')
+def dashboard_app(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('dashboard')
+    (directory / 'data').mkdir()
+    (directory / 'scanner_data').mkdir()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('NMAPPING_DASHBOARD_DIR', str(directory))
+        patch.setenv('NMAPPING_BACKGROUND_SYNC', '0')
+        yield importlib.import_module('dashboard_app')
+
+
+def write_device(app, ip, last_seen):
+    path = os.path.join(app.SCANNER_DATA_PATH, f'{ip}.md')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(DEVICE_FILE.format(ip=ip, last_seen=datetime.fromtimestamp(last_seen).strftime('%Y-%m-%d %H:%M')))
+    # Sync by fingerprint: make sure a rewrite shows up as changed
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 1000))
+
+
+def status_history(app, ip):
+    changes, _ = app.dashboard.query_changes(ip=ip, field='status')
+    return [(change['old_value'], change['new_value']) for change in reversed(changes)]
+
+
+def test_device_going_offline_and_coming_back_is_recorded(dashboard_app, monkeypatch):
+    clock = Clock(time.time())
+    monkeypatch.setattr(dashboard_app, 'time', clock)
+    ip = '10.9.0.1'
+
+    write_device(dashboard_app, ip, clock.now - 3600)
+    assert dashboard_app.dashboard.sync_from_scanner_data()
+    assert status_history(dashboard_app, ip) == []
+
+    # Nine days without a scan: the next sync finds it aged past every window
+    clock.now += 9 * 86400
+    assert dashboard_app.dashboard.sync_from_scanner_data()
+    assert status_history(dashboard_app, ip) == [('online', 'offline')]
+
+    # Seen again
+    write_device(dashboard_app, ip, clock.now - 60)
+    assert dashboard_app.dashboard.sync_from_scanner_data()
+    assert status_history(dashboard_app, ip) == [('online', 'offline'), ('offline', 'online')]
+
+
+def test_status_changes_are_recorded_once_per_window(dashboard_app, monkeypatch):
+    clock = Clock(time.time() + 30 * 86400)
+    monkeypatch.setattr(dashboard_app, 'time', clock)
+    ip = '10.9.0.2'
+
+    write_device(dashboard_app, ip, clock.now - 3600)
+    assert dashboard_app.dashboard.sync_from_scanner_data()
+    for days in (1, 1, 1, 5, 1):
+        clock.now += days * 86400
+        assert dashboard_app.dashboard.sync_from_scanner_data()
+    assert status_history(dashboard_app, ip) == [
+        ('online', 'recently_seen'), ('recently_seen', 'inactive'), ('inactive', 'offline')]
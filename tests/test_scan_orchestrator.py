@@ -0,0 +1,116 @@
+"""Scan orchestrator tests, run against a fake nmap script on PATH"""
+
+import os
+import stat
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+from scan_orchestrator import ScanOrchestrator, split_targets
+
+# Writes one up host per target to the -oX path. Targets in 10.0.2.0/24
+# fail on their first call, targets in 10.0.3.0/24 hang.
+FAKE_NMAP = '''\
+#!{python}
+import os
+import sys
+import time
+
+args = sys.argv[1:]
+output = args[args.index('-oX') + 1]
+targets = [arg for i, arg in enumerate(args) if not arg.startswith('-') and args[i - 1] not in ('-oX', '--exclude')]
+with open(os.path.join({workdir!r}, 'calls.log'), 'a') as f:
+    f.write(' '.join(targets) + '\\n')
+if any(target.startswith('10.0.2.') for target in targets):
+    flag = os.path.join({workdir!r}, 'failed-once')
+    if not os.path.exists(flag):
+        open(flag, 'w').close()
+        sys.exit('simulated failure')
+if any(target.startswith('10.0.3.') for target in targets):
+    time.sleep(30)
+hosts = ''.join(
+    '<host><status state="up"/><address addr="%s" addrtype="ipv4"/></host>' % target.split('/')[0]
+    for target in targets)
+with open(output, 'w') as f:
+    f.write('<?xml version="1.0"?><nmaprun>%s</nmaprun>' % hosts)
+'''
+
+
+@pytest.fixture
+def fake_nmap(tmp_path, monkeypatch):
+    """Put the fake nmap first on PATH; returns a function reading the targets of each call"""
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    script = bindir / 'nmap'
+    script.write_text(FAKE_NMAP.format(python=sys.executable, workdir=str(tmp_path)))
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv('PATH', f"{bindir}{os.pathsep}{os.environ['PATH']}")
+
+    def calls():
+        log = tmp_path / 'calls.log'
+        return log.read_text().splitlines() if log.exists() else []
+
+    return calls
+
+
+def test_split_targets_cuts_large_networks_and_packs_small_ones():
+    shards = split_targets(['10.1.0.0/23', '10.0.7.0/25', '10.0.7.128/25', 'host.lan'])
+    assert shards == [['10.1.0.0/24'], ['10.1.1.0/24'], ['10.0.7.0/25', '10.0.7.128/25'], ['host.lan']]
+
+
+def test_split_targets_expands_last_octet_ranges():
+    assert split_targets(['10.0.5.0-255'], prefix=26) == [
+        ['10.0.5.0/26'], ['10.0.5.64/26'], ['10.0.5.128/26'], ['10.0.5.192/26']]
+    assert split_targets(['10.0.5.*', '10.0.6.1-2']) == [['10.0.5.0/24'], ['10.0.6.1/32', '10.0.6.2/32']]
+    # Other forms are passed on as written
+    assert split_targets(['10.0.1-3.*']) == [['10.0.1-3.*']]
+
+
+def test_split_targets_drops_excluded_subnets():
+    shards = split_targets(['10.1.0.0/22', '10.0.5.0-95'], exclude=['10.1.1.0/24', '10.0.5.0/26'])
+    assert shards == [['10.1.0.0/24'], ['10.1.2.0/24'], ['10.1.3.0/24'], ['10.0.5.64/27']]
+
+
+def test_split_targets_refuses_too_many_shards():
+    with pytest.raises(ValueError):
+        split_targets(['2001:db8::/64'])
+
+
+def test_run_retries_times_out_and_ingests(fake_nmap):
+    ingested = []
+
+    def ingest(path):
+        hosts = [address.get('addr') for address in ET.parse(path).iter('address')]
+        ingested.append(sorted(hosts))
+        return {'hosts': len(hosts), 'added': len(hosts), 'updated': 0}
+
+    orchestrator = ScanOrchestrator(['-sn'], ingest, max_parallel=2, timeout=1, retries=1, retry_delay=0)
+    shards = split_targets(['10.0.1.0/24', '10.0.2.0/23'])
+    summary = orchestrator.run(shards)
+
+    # 10.0.2.0/24 succeeds on its retry, 10.0.3.0/24 times out on both attempts
+    assert summary['shards'] == 3
+    assert summary['succeeded'] == 2
+    assert summary['failed'] == ['10.0.3.0/24']
+    assert summary['hosts'] == summary['added'] == 2
+    assert sorted(ingested) == [['10.0.1.0'], ['10.0.2.0']]
+    assert sorted(fake_nmap()) == ['10.0.1.0/24', '10.0.2.0/24', '10.0.2.0/24', '10.0.3.0/24', '10.0.3.0/24']
+
+
+def test_run_reports_failed_ingest(fake_nmap):
+    orchestrator = ScanOrchestrator(['-sn'], lambda path: {'error': 'database is locked'}, retry_delay=0)
+    summary = orchestrator.run([['10.0.1.0/24']])
+    assert summary['succeeded'] == 0
+    assert summary['failed'] == ['10.0.1.0/24']
+
+
+def test_command_passes_exclusions_to_nmap():
+    orchestrator = ScanOrchestrator(['-F'], ingest=None, exclude=['10.0.0.1', '10.0.0.2'])
+    assert orchestrator.command(['10.0.0.0/24'], 'out.xml') == [
+        'nmap', '-F', '-oX', 'out.xml', '--exclude', '10.0.0.1,10.0.0.2', '10.0.0.0/24']
+
+
+def test_missing_nmap_fails_every_attempt(tmp_path):
+    orchestrator = ScanOrchestrator([], ingest=None, nmap=str(tmp_path / 'nmap'), retries=1, retry_delay=0)
+    summary = orchestrator.run([['10.0.1.0/24']])
+    assert summary['failed'] == ['10.0.1.0/24']